@@ -0,0 +1,331 @@
+#!/usr/bin/env python
+
+# MERGE statements
+import re
+# Concurrent transactions
+import threading
+import concurrent.futures
+# Retry delays
+import time
+
+# Neo4j driver, if available
+try:
+  import neo4j
+  import neo4j.exceptions
+except ImportError:
+  neo4j = None
+
+# Base writer
+import StatementWriter
+
+
+#
+#
+# Constants
+CONST_Transaction_Size = 1000
+CONST_Concurrency = 4
+CONST_Retries = 5
+# Seconds, doubled on each retry
+CONST_Retry_Delay = 0.1
+
+# Node statements with a MERGE clause, see `BoltWriter.addStatement`
+CONST_RE_Merge = r'^MERGE\b'
+
+RE_Merge = re.compile(CONST_RE_Merge, re.M)
+
+
+#
+# Transient failure raised by fake drivers, see `RecordingDriver`
+class TransientError(Exception):
+  pass
+
+# Errors after which a transaction is retried: deadlocks, leader switches,
+# lost connections...
+CONST_Transient_Errors = ( TransientError, ) + (
+  (
+    neo4j.exceptions.TransientError,
+    neo4j.exceptions.ServiceUnavailable,
+    neo4j.exceptions.SessionExpired
+  ) if neo4j else ()
+)
+
+
+#
+#
+# Utils
+
+#
+# Neo4j driver for {uri}, e.g. 'neo4j://localhost:7687', keeping at most
+# {poolSize} connections
+def connect(uri, auth = None, poolSize = CONST_Concurrency):
+  if neo4j == None:
+    raise ImportError('BoltWriter requires the neo4j driver: pip install neo4j')
+
+  return neo4j.GraphDatabase.driver(uri, auth = auth, max_connection_pool_size = poolSize)
+
+
+#
+#
+# Core
+
+#
+# Writer sending statements straight to Neo4j over Bolt, in transactions of
+# {transactionSize} statements, instead of writing them to a file.
+# {driver} is a Neo4j driver (closed by the caller) or a URI to connect to
+# with {auth} (closed by `close`). {database} defaults to the server's.
+# Up to {concurrency} transactions run at once, each in its own session
+# from the driver's connection pool, and at most {maxInFlight} (twice
+# {concurrency} by default) are queued or running: past that, the
+# conversion waits. Transactions failing with a transient error (see
+# CONST_Transient_Errors) are retried up to {retries} times; other errors
+# stop the writer and are raised by the next call.
+# Statements with a MERGE clause (`@MERGE` nodes) are batched apart and
+# their transactions run one at a time, while others run concurrently: two
+# concurrent transactions merging the same node would both create it.
+# Nodes are committed before relationships, which are sent on `close`:
+# the same writer is used for nodes and relationships, e.g.
+# x2c.apply(o, bolt, bolt). See `CypherWriter.CypherWriter` for {dedup},
+# {order} and {compact}.
+class BoltWriter(StatementWriter.StatementWriter):
+
+  def __init__(self, driver, auth = None, database = None,
+               transactionSize = CONST_Transaction_Size, concurrency = CONST_Concurrency,
+               maxInFlight = None, retries = CONST_Retries,
+               dedup = None, order = None, compact = False):
+    self.ownsDriver = isinstance(driver, str)
+    self.driver = connect(driver, auth, concurrency) if self.ownsDriver else driver
+    self.database = database
+    self.batchSize = transactionSize or CONST_Transaction_Size
+    self.retries = retries
+
+    # Statements of the next transactions, see `addStatement`
+    self.batch = []
+    self.mergeBatch = []
+    self.executor = concurrent.futures.ThreadPoolExecutor(concurrency)
+    # Runs MERGE transactions serially
+    self.mergeExecutor = concurrent.futures.ThreadPoolExecutor(1)
+    self.inFlight = threading.BoundedSemaphore(maxInFlight or 2 * concurrency)
+    self.futures = []
+
+    # Updated by transaction threads
+    self.lock = threading.Lock()
+    self.error = None
+    self.transactions = 0
+    self.statements = 0
+    self.retried = 0
+
+    super().__init__(self.addStatement, dedup, order, compact)
+
+  #
+  # Sink of `StatementWriter`
+  def addStatement(self, statement):
+    if RE_Merge.search(statement):
+      self.mergeBatch.append(statement)
+
+      if len(self.mergeBatch) >= self.batchSize:
+        self.submitMerge()
+
+      return
+
+    self.batch.append(statement)
+
+    if len(self.batch) >= self.batchSize:
+      self.submit()
+
+  #
+  # Send the current batch in a transaction, waiting for a slot if
+  # {maxInFlight} transactions are pending
+  def submit(self):
+    batch = self.batch
+    self.batch = []
+
+    self.submitBatch(self.executor, batch)
+
+  #
+  # Send the current batch of MERGE statements, after the previous ones
+  def submitMerge(self):
+    batch = self.mergeBatch
+    self.mergeBatch = []
+
+    self.submitBatch(self.mergeExecutor, batch)
+
+  def submitBatch(self, executor, batch):
+    self.checkError()
+
+    if not batch:
+      return
+
+    self.inFlight.acquire()
+
+    try:
+      future = executor.submit(self.runTransaction, batch)
+    except BaseException:
+      self.inFlight.release()
+      raise
+
+    future.add_done_callback(self.transactionDone)
+    self.futures.append(future)
+
+  #
+  # Run {batch} in a transaction, with retries. Runs in executor threads.
+  def runTransaction(self, batch):
+    attempt = 0
+
+    while True:
+      # Later transactions are pointless once one failed
+      if self.error:
+        return
+
+      session = self.driver.session(database = self.database)
+
+      try:
+        tx = session.begin_transaction()
+
+        try:
+          for statement in batch:
+            tx.run(statement)
+
+          tx.commit()
+
+        finally:
+          tx.close()
+
+        with self.lock:
+          self.transactions += 1
+          self.statements += len(batch)
+
+        return
+
+      except CONST_Transient_Errors:
+        if attempt >= self.retries:
+          raise
+
+      finally:
+        session.close()
+
+      with self.lock:
+        self.retried += 1
+
+      time.sleep(CONST_Retry_Delay * 2 ** attempt)
+      attempt += 1
+
+  def transactionDone(self, future):
+    self.inFlight.release()
+
+    e = future.exception()
+    if e != None:
+      with self.lock:
+        self.error = self.error or e
+
+  #
+  # Raise the first error of a transaction, if any
+  def checkError(self):
+    if self.error:
+      raise self.error
+
+  #
+  # Send the current batches, and wait for all pending transactions
+  def wait(self):
+    # Last statement written
+    self.updateTransaction(True)
+    self.submit()
+    self.submitMerge()
+
+    concurrent.futures.wait(self.futures)
+    self.futures = []
+
+    self.checkError()
+
+  #
+  # Commit pending nodes, then send relationships, which match them
+  def flushRelationships(self):
+    self.wait()
+    super().flushRelationships()
+    self.wait()
+
+  #
+  # Send everything, wait for it and release connections
+  def close(self):
+    try:
+      self.flushRelationships()
+
+    finally:
+      self.executor.shutdown()
+      self.mergeExecutor.shutdown()
+
+      if self.ownsDriver:
+        self.driver.close()
+
+  #
+  # Counts of committed transactions and statements, and of retries
+  def report(self):
+    return {
+      'transactions': self.transactions,
+      'statements': self.statements,
+      'retries': self.retried
+    }
+
+
+#
+#
+# Testing
+
+#
+# Driver with the interface used by BoltWriter which records committed
+# transactions instead of sending them, e.g. to check a schema's output
+# offline. The first {failures} commits fail with a TransientError.
+class RecordingDriver:
+
+  def __init__(self, failures = 0):
+    self.failures = failures
+    # ( database, [ statements ] ), in commit order
+    self.transactions = []
+    self.attempts = 0
+    self.closed = False
+    self.lock = threading.Lock()
+
+  def session(self, database = None):
+    return RecordingSession(self, database)
+
+  #
+  # Committed statements, in commit order
+  def statements(self):
+    return [ s for (_, statements) in self.transactions for s in statements ]
+
+  def close(self):
+    self.closed = True
+
+class RecordingSession:
+
+  def __init__(self, driver, database):
+    self.driver = driver
+    self.database = database
+
+  def begin_transaction(self):
+    return RecordingTransaction(self.driver, self.database)
+
+  def close(self):
+    pass
+
+class RecordingTransaction:
+
+  def __init__(self, driver, database):
+    self.driver = driver
+    self.database = database
+    self.statements = []
+
+  def run(self, statement, parameters = None):
+    self.statements.append(statement)
+
+  def commit(self):
+    with self.driver.lock:
+      self.driver.attempts += 1
+
+      if self.driver.failures > 0:
+        self.driver.failures -= 1
+        raise TransientError('Simulated transient failure')
+
+      self.driver.transactions.append(( self.database, self.statements ))
+
+  def close(self):
+    pass
@@ -2,35 +2,141 @@
 
 # For hash identification
 import hashlib
-# OrderedDict
-from collections import OrderedDict
+# Compact pending relationships
+from array import array
+# String interning
+import sys
+# Copying statements written by other writers
+import shutil
 
-# When enabled, strips unnecessary whitespaces
-CONST_Optimize = False
+# Relationship de-duplication
+import DedupHelper
+
+# Relationship orders, see `CypherWriter.relationshipOrder`
+CONST_Orders = [ 'key', 'source', 'target' ]
 
 
+#
+# Nodes of a single record, and relationships between them, to be written in
+# one statement. See `CypherWriter.record`
+class CypherRecord:
+  
+  def __init__(self):
+    self.clear()
+  
+  def clear(self):
+    self.nodes = []
+    self.relationships = []
+    # {label}: [indices in {nodes}]
+    self.labels = {}
+  
+  def node(self, label, properties, merge):
+    self.labels.setdefault(label, []).append(len(self.nodes))
+    self.nodes.append(( label, properties, merge ))
+  
+  #
+  # Index of the only node of this record {label} and {properties} identify,
+  # None if there are none or several
+  def find(self, label, properties):
+    found = None
+    
+    if not properties:
+      return None
+    
+    for i in self.labels.get(label, []):
+      nodeProps = self.nodes[i][1] or {}
+      
+      if all([ k in nodeProps and nodeProps[k] == v for (k, v) in properties.items() ]):
+        if found != None:
+          return None
+        
+        found = i
+    
+    return found
+  
+  def relationship(self, src, tgt, rsName, rsProps):
+    self.relationships.append(( src, tgt, rsName, rsProps ))
+
+#
+# Nodes by label, looked up by any subset of their properties, e.g. the
+# properties identifying a relationship endpoint. Indexes are built per set
+# of property names on first lookup, and extended with nodes added since.
+class NodeIndex:
+  
+  def __init__(self):
+    # {label}: [ ( properties, value ) ]
+    self.nodes = {}
+    # ( label, property names ): [ { property values: value }, nodes indexed ]
+    self.indexes = {}
+  
+  def add(self, label, properties, value):
+    self.nodes.setdefault(label, []).append(( properties, value ))
+  
+  #
+  # Values of the nodes {label} whose properties include {properties}, in
+  # the order they were added, as a MATCH would find them
+  def findAll(self, label, properties):
+    names = tuple(sorted(properties.keys()))
+    nodes = self.nodes.get(label, [])
+    index = self.indexes.setdefault(( label, names ), [ {}, 0 ])
+    
+    for (nodeProps, value) in nodes[index[1]:]:
+      if all([ k in nodeProps for k in names ]):
+        index[0].setdefault(tuple([ nodeProps[k] for k in names ]), []).append(value)
+    
+    index[1] = len(nodes)
+    
+    return index[0].get(tuple([ properties[k] for k in names ]), [])
+  
+  #
+  # Value of the first node {label} whose properties include {properties},
+  # None if there are none
+  def find(self, label, properties):
+    values = self.findAll(label, properties)
+    
+    return values[0] if values else None
+
 #
 # Helper class, define methods used in writing Cypher commands to file.
 class CypherWriter:
   
-  def __init__(self, filename):
+  # With {dedup} ('exact', 'bloom' or a DedupHelper filter), relationships
+  # pending with the same endpoints, type and properties are written once
+  # With {transactionSize}, statements are wrapped in :begin / :commit blocks
+  # of that many statements, see `updateTransaction`. {bufferSize} is the
+  # output file buffer size in bytes (-1 for the default). {order} is the
+  # order relationships are written in, see `relationshipOrder`. With
+  # {compact}, statements are written without optional whitespace, and
+  # relationship endpoints are named a and b instead of {nodeLbl}{nodeHash}
+  def __init__(self, filename, dedup = None, transactionSize = None, bufferSize = -1,
+               order = None, compact = False):
     self.cmdCounter = 0
-    self.rsDict = {}
-    self.rsProps = {}
+    self.transactionSize = transactionSize
+    self.compact = compact
+    
+    if order not in [ None ] + CONST_Orders:
+      raise ValueError('Unknown relationship order: ' + str(order))
+    
+    self.order = order or 'key'
+    # Duplicate relationships dropped, see `addRelationship`
+    self.dedup = DedupHelper.makeFilter(dedup)
+    self.duplicates = 0
+    # Relationships waiting for `flushRelationships`, see `relationship`
+    self.clearRelationships()
+    # Optional progress reporting, see `Metrics.attach`
+    self.metrics = None
   
-    self.file = open(filename, "w+", encoding="utf8")
+    # {filename} may also be an open file object, left open by `close`
+    self.ownsFile = not hasattr(filename, 'write')
+    self.file =                                                               \
+      open(filename, "w+", encoding="utf8", buffering=bufferSize) if self.ownsFile \
+      else filename
   
   #
   # Write {buff} to file
+  # Whitespace is left out while formatting statements in compact mode, see
+  # `CypherWriter`, as stripping it here would alter string values
   def write(self, buff):
-    # Legacy - This will wreck text properties values
-    if False and CONST_Optimize is True:
-      buff = buff.replace('  ', '')
-      buff = buff.replace(', ', ',')
-      buff = buff.replace(': ', ':')
-      buff = buff.replace(' (', '(')
-      #buff = buff.strip('\t\n')
-    
     self.file.write(buff)
   
   def sanitize(self, buff):
@@ -43,22 +149,32 @@ class CypherWriter:
     return buff
   
   #
-  # Legacy comment:
-  # Transparently write transactions in batch of 500 commands
+  # Transparently write transactions in batch of {transactionSize} commands
   # If program is terminating, specifying {closing} appends the final :commit
-  def updateTransaction(self):
+  def updateTransaction(self, closing = False):
     if self.cmdCounter > 0:
       self.write(";\n")
-      
-    self.cmdCounter += 1
+    
+    if self.transactionSize:
+      if closing or self.cmdCounter % self.transactionSize == 0:
+        if self.cmdCounter > 0:
+          self.write(":commit\n")
+        
+        if not closing:
+          self.write(":begin\n")
+    
+    if not closing:
+      self.cmdCounter += 1
   
   #
   # Format property key-value with account to Cypher syntax
   def formatProperty(self, k, v):
+    separator = ':' if self.compact else ': '
+    
     if type(v) == str:
-      return '%s: "%s"' % (k, self.sanitize(v))
+      return '%s%s"%s"' % (k, separator, self.sanitize(v))
     
-    return '%s: %s' % (k, v)
+    return '%s%s%s' % (k, separator, v)
 
   
   #
@@ -67,7 +183,9 @@ class CypherWriter:
     return                                                                   \
       "" if props == None or not any(props)                                  \
       else "{" +                                                             \
-        ", ".join([self.formatProperty(k, v) for (k, v) in props.items()]) + \
+        ("," if self.compact else ", ").join(                                \
+          [self.formatProperty(k, v) for (k, v) in props.items()]            \
+        ) +                                                                  \
         "}"
   
   #
@@ -79,13 +197,12 @@ class CypherWriter:
     return hashlib.md5(self.flattenProperties(props).encode('utf-8')).hexdigest()
   
   #
-  # Create a new node, given {label} and {properties}
-  def node(self, label, properties = None, merge = False):
-    self.updateTransaction()
-    self.write(
-      ('CREATE ' if not merge else 'MERGE ') +
+  # Format node creation clause, optionally binding it to {varName}
+  def formatNode(self, label, properties = None, merge = False, varName = ""):
+    return (
+      ('CREATE' if not merge else 'MERGE') + ('' if self.compact else ' ') +
       # Label
-      "(:" + label +
+      "(" + varName + ":" + label +
       # Properties
       self.flattenProperties(properties) +
       # Closing parenthesis
@@ -93,81 +210,304 @@ class CypherWriter:
     )
   
   #
-  # Ensure required matches for relationship are loaded
-  def ensureMatch(self, key):
-    # {nodeLbl1}:{nodeId1}:{nodeLbl2}:{nodeId2}
-    keySplit = key.split(':')
-    newMatches =                        \
-      [                                 \
-        ( keySplit[0], keySplit[1] ),   \
-        ( keySplit[2], keySplit[3] )    \
-      ]
-    
-    # If match is not yet loaded, make it so
-    for newMatch in newMatches:
-      # {nodeLbl}{nodeId}
-      varName = newMatch[0] + newMatch[1]
+  # Create a new node, given {label} and {properties}
+  def node(self, label, properties = None, merge = False):
+    if self.metrics:
+      self.metrics.node(label)
+    
+    self.updateTransaction()
+    self.write(self.formatNode(label, properties, merge))
+  
+  #
+  # Write nodes of {record} and relationships between them in one statement,
+  # e.g. CREATE (n0:Artist{...})\nCREATE (n1:Song{...})\nCREATE (n0)-[:AUTHORED]->(n1)
+  # Records without relationships are written as individual nodes.
+  def record(self, record):
+    if not record.relationships:
+      for (label, properties, merge) in record.nodes:
+        self.node(label, properties, merge)
       
-      cmd =                                         \
-        "MATCH (" + varName + ":" + newMatch[0] +   \
-        self.rsProps[newMatch[1]] + ")\n"
+      return
+    
+    bound = set([ src for (src, _, _, _) in record.relationships ]) |   \
+            set([ tgt for (_, tgt, _, _) in record.relationships ])
+    
+    clauses = []
+    
+    for (i, (label, properties, merge)) in enumerate(record.nodes):
+      clauses.append(
+        self.formatNode(label, properties, merge, "n%d" % i if i in bound else "")
+      )
+      
+      if self.metrics:
+        self.metrics.node(label)
+    
+    for (src, tgt, rsName, rsProps) in record.relationships:
+      clauses.append(
+        ("CREATE(n%d)-[:%s%s]->(n%d)" if self.compact else "CREATE (n%d)-[:%s%s]->(n%d)") %
+        (src, rsName, self.flattenProperties(rsProps), tgt)
+      )
+      
+      if self.metrics:
+        self.metrics.relationship(rsName)
+    
+    self.updateTransaction()
+    self.write("\n".join(clauses))
+  
+  #
+  # Handle of the endpoint identified by {label} and {props}, see `relationship`
+  def endpoint(self, label, props):
+    if props == None:
+      raise ValueError('Cannot identify node stripped of properties')
+    
+    return self.internEndpoint(
+      label, self.flattenProperties(props), tuple(sorted(props.keys()))
+    )
+  
+  #
+  # {names} are the sorted property names of {flatProps}
+  def internEndpoint(self, label, flatProps, names):
+    key = ( label, flatProps )
+    handle = self.endpoints.get(key, None)
+    
+    if handle == None:
+      handle = self.endpoints[key] = len(self.endpointLabels)
+      self.endpointLabels.append(sys.intern(label))
+      self.endpointProps.append(flatProps)
+      self.endpointKeys.append(self.endpointKeySets.setdefault(names, names))
+    
+    return handle
+  
+  #
+  # Index of {s} in the interned strings table
+  def intern(self, s):
+    idx = self.strings.get(s, None)
+    
+    if idx == None:
+      idx = self.strings[s] = len(self.stringList)
+      self.stringList.append(s)
+    
+    return idx
+  
+  #
+  # MATCH clause for endpoint {handle}, bound to {varName}
+  def formatMatch(self, handle, varName):
+    return                                                    \
+      ("MATCH(" if self.compact else "MATCH (") +              \
+      varName + ":" + self.endpointLabels[handle] +            \
+      self.endpointProps[handle] + ")\n"
+  
+  #
+  # Indices of pending relationships in the order they are written:
+  # - 'key' (legacy): sorted by {nodeLbl1}:{nodeHash1}:{nodeLbl2}:{nodeHash2},
+  #   most recent first. {hashes} are the endpoint hashes.
+  # - 'source', 'target': clustered by source (resp. target) endpoint, then by
+  #   the other one, in the order endpoints were first referenced. As
+  #   relationships are declared along with their nodes, this follows node
+  #   creation order, so importing them matches nodes sequentially rather
+  #   than at random.
+  def relationshipOrder(self, hashes):
+    if self.order == 'key':
+      sortKeys = [ l + ':' + h for (l, h) in zip(self.endpointLabels, hashes) ]
       
-      self.write(cmd)
+      return sorted(
+        range(len(self.rsSrc)),
+        key = lambda i: ( sortKeys[self.rsSrc[i]], sortKeys[self.rsTgt[i]], -i )
+      )
+    
+    first, second = ( self.rsSrc, self.rsTgt ) if self.order == 'source' else \
+                    ( self.rsTgt, self.rsSrc )
     
+    # Stable, relationships between the same endpoints keep their order
+    return sorted(
+      range(len(self.rsSrc)),
+      key = lambda i: first[i] << 32 | second[i]
+    )
+  
+  #
+  # Endpoint hashes by handle, None when neither names nor order need them
+  def endpointHashes(self):
+    if self.compact and self.order != 'key':
+      return None
+    
+    return [
+      hashlib.md5(props.encode('utf-8')).hexdigest()
+      for props in self.endpointProps
+    ]
+  
+  #
+  # Endpoints are named {nodeLbl}{nodeHash}, or a and b in compact mode (None)
+  def endpointNames(self, hashes):
+    if self.compact:
+      return None
+    
+    return [ l + h for (l, h) in zip(self.endpointLabels, hashes) ]
+  
+  #
+  # Statement creating pending relationship {i}, see `endpointNames`
+  def formatRelationship(self, i, varNames):
+    src = self.rsSrc[i]
+    tgt = self.rsTgt[i]
+    srcName, tgtName =                                                      \
+      ( varNames[src], varNames[tgt] ) if varNames else ( 'a', 'b' )
+    
+    return                                                                  \
+      self.formatMatch(src, srcName) +                                      \
+      self.formatMatch(tgt, tgtName) +                                      \
+      ("CREATE(" if self.compact else "CREATE (") +                         \
+      srcName + ")" +                                                       \
+      "-[:" + self.stringList[self.rsType[i]] +                             \
+      self.stringList[self.rsPropsIdx[i]] + "]->" +                         \
+      "(" + tgtName + ")"
+  
   #
   # Write all pending relationship in a somewhat orderly fashion
   def flushRelationships(self):
-    # (Legacy code)
-    oDict = OrderedDict(sorted(self.rsDict.items(), key = lambda t: t[0]))
+    hashes = self.endpointHashes()
+    varNames = self.endpointNames(hashes)
+    
+    for i in self.relationshipOrder(hashes):
+      self.updateTransaction()
+      
+      # Create actual rs
+      # ({nodeLbl1}{nodeId1})-[:{rsName}{props}]->({nodeLbl2}{nodeId2})
+      self.write(self.formatRelationship(i, varNames))
+    
+    self.clearRelationships()
+  
+  #
+  # Pending relationships as a picklable tuple, see `importRelationships`
+  def exportRelationships(self):
+    return (
+      self.endpointLabels, self.endpointProps, self.endpointKeys, self.stringList,
+      self.rsSrc, self.rsTgt, self.rsType, self.rsPropsIdx
+    )
+  
+  #
+  # Append relationships exported by another writer to pending ones
+  def importRelationships(self, exported):
+    labels, props, keys, strings, rsSrc, rsTgt, rsType, rsPropsIdx = exported
     
-    for rsKey in oDict:
+    endpoints = [
+      self.internEndpoint(l, p, k) for (l, p, k) in zip(labels, props, keys)
+    ]
+    strings = [ self.intern(s) for s in strings ]
+    
+    if self.dedup:
+      for i in range(len(rsSrc)):
+        self.addRelationship(
+          endpoints[rsSrc[i]], endpoints[rsTgt[i]],
+          strings[rsType[i]], strings[rsPropsIdx[i]]
+        )
       
-      while any(self.rsDict[rsKey]):
+      return
+    
+    self.rsSrc.extend([ endpoints[h] for h in rsSrc ])
+    self.rsTgt.extend([ endpoints[h] for h in rsTgt ])
+    self.rsType.extend([ strings[h] for h in rsType ])
+    self.rsPropsIdx.extend([ strings[h] for h in rsPropsIdx ])
+    self.pendingCount += len(rsSrc)
+  
+  #
+  # Append {count} statements read from file object {fd}, as written by
+  # another writer (statements separated by ";\n", without the final one)
+  # With {transactionSize}, statements are copied one by one so that
+  # transactions keep their size. String values never hold a raw newline (see
+  # `sanitize`), so only separators end a line with ";".
+  def append(self, fd, count):
+    if count < 1:
+      return
+    
+    if not self.transactionSize:
+      self.updateTransaction()
+      shutil.copyfileobj(fd, self.file)
+      self.cmdCounter += count - 1
+      return
+    
+    statement = []
+    
+    for line in fd:
+      if line.endswith(";\n"):
+        statement.append(line[:-2])
         self.updateTransaction()
-        
-        self.ensureMatch(rsKey)
-        
-        # Create actual rs
-        self.write(self.rsDict[rsKey].pop())
+        self.write("".join(statement))
+        statement = []
+      
+      else:
+        statement.append(line)
+    
+    if statement:
+      self.updateTransaction()
+      self.write("".join(statement))
+  
+  #
+  # Drop pending relationships and their endpoints
+  def clearRelationships(self):
+    self.rsSrc = array('I')
+    self.rsTgt = array('I')
+    self.rsType = array('I')
+    self.rsPropsIdx = array('I')
+    
+    self.endpoints = {}
+    self.endpointLabels = []
+    self.endpointProps = []
+    # Property names identifying each endpoint, shared, see PartitionedWriter
+    self.endpointKeys = []
+    self.endpointKeySets = {}
+    
+    self.strings = {}
+    self.stringList = []
+    
+    self.pendingCount = 0
+    
+    # Keys are handles, only valid until cleared
+    if self.dedup:
+      self.dedup.clear()
+  
+  #
+  # Append relationship from handles, unless it is a duplicate. Returns
+  # whether it was appended
+  def addRelationship(self, src, tgt, rsType, rsPropsIdx):
+    if self.dedup:
+      key = (((src << 32 | tgt) << 32 | rsType) << 32) | rsPropsIdx
+      
+      if not self.dedup.add(key):
+        self.duplicates += 1
+        return False
+    
+    self.rsSrc.append(src)
+    self.rsTgt.append(tgt)
+    self.rsType.append(rsType)
+    self.rsPropsIdx.append(rsPropsIdx)
+    self.pendingCount += 1
+    
+    return True
   
   #
   # Create a new relationship between nodes
+  # Relationships are kept as handles into interned endpoints and strings
+  # tables until `flushRelationships` renders them
   def relationship(self,
                    nodeLbl1, nodeProps1,
                    nodeLbl2, nodeProps2,
                    rsName, rsProps = None):
-    nodeHash1 = self.hashProperties(nodeProps1)
-    nodeHash2 = self.hashProperties(nodeProps2)
-    
-    # {nodeLbl1}:{nodeHash1}:{nodeLbl2}:{nodeHash2}
-    key =                 \
-      nodeLbl1 + ":" +    \
-      nodeHash1 + ":" +   \
-      nodeLbl2 + ":" +    \
-      nodeHash2
-    
-    if not key in self.rsDict:
-      self.rsDict[key] = []
+    src = self.endpoint(nodeLbl1, nodeProps1)
+    tgt = self.endpoint(nodeLbl2, nodeProps2)
     
-    # Prepare cypher command
-    # ({nodeLbl1}{nodeId1})-[:{rsName}{props}]->({nodeLbl2}{nodeId2})
-    cmd =                                                                       \
-      "CREATE "                                                                 \
-      "(" + nodeLbl1 + nodeHash1 + ")" +                                        \
-      "-[:" + rsName + self.flattenProperties(rsProps) + "]->" + \
-      "(" + nodeLbl2 + nodeHash2 + ")"
+    if not self.addRelationship(
+      src, tgt,
+      self.intern(rsName), self.intern(self.flattenProperties(rsProps))
+    ):
+      return
     
-    # Append command to be written prior to termination
-    # See `CypherWriter.flushRelationships`
-    self.rsDict[key].append(cmd)
-    
-    # Alongside associated properties to MATCH the nodes
-    self.rsProps[nodeHash1] = self.flattenProperties(nodeProps1)
-    self.rsProps[nodeHash2] = self.flattenProperties(nodeProps2)
+    if self.metrics:
+      self.metrics.relationship(rsName)
   
   #
   # Flush pending relationships, appends final :commit, close file
   def close(self):
     self.flushRelationships()
-    self.updateTransaction()
-    self.file.close()
\ No newline at end of file
+    self.updateTransaction(True)
+    
+    if self.ownsFile:
+      self.file.close()
\ No newline at end of file
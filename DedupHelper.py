@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+
+# Bloom filter hashing
+import hashlib
+# Bloom filter sizing
+import math
+
+
+#
+#
+# Constants
+CONST_Bloom_Capacity = 10000000
+CONST_Bloom_Error_Rate = 0.001
+
+
+#
+# Exact membership: remembers every key
+class ExactFilter:
+
+  def __init__(self):
+    self.keys = set()
+
+  #
+  # Add {key}, return False if it was already there
+  def add(self, key):
+    if key in self.keys:
+      return False
+
+    self.keys.add(key)
+    return True
+
+  def clear(self):
+    self.keys = set()
+
+
+#
+# Probabilistic membership in fixed memory, sized for {capacity} keys with a
+# false positive rate of {errorRate}. A false positive drops a key that was
+# never seen; keys seen before are always detected.
+class BloomFilter:
+
+  def __init__(self, capacity = CONST_Bloom_Capacity, errorRate = CONST_Bloom_Error_Rate):
+    self.capacity = capacity
+    self.errorRate = errorRate
+
+    self.size = max(8, int(-capacity * math.log(errorRate) / math.log(2) ** 2))
+    self.hashCount = max(1, round(self.size / capacity * math.log(2)))
+    self.clear()
+
+  #
+  # Bit positions of {key} (an int), by double hashing
+  def positions(self, key):
+    digest = hashlib.blake2b(
+      key.to_bytes((key.bit_length() + 8) // 8, 'little'), digest_size = 16
+    ).digest()
+
+    h1 = int.from_bytes(digest[:8], 'little')
+    h2 = int.from_bytes(digest[8:], 'little') | 1
+
+    return [ (h1 + i * h2) % self.size for i in range(self.hashCount) ]
+
+  #
+  # Add {key}, return False if it was (probably) already there
+  def add(self, key):
+    new = False
+
+    for pos in self.positions(key):
+      mask = 1 << (pos & 7)
+
+      if not self.bits[pos >> 3] & mask:
+        self.bits[pos >> 3] |= mask
+        new = True
+
+    return new
+
+  def clear(self):
+    self.bits = bytearray((self.size + 7) // 8)
+
+
+#
+# Filter for mode {dedup}: 'exact', 'bloom', or a filter instance (anything
+# with `add` and `clear`). None disables de-duplication.
+def makeFilter(dedup):
+  if dedup == None or hasattr(dedup, 'add'):
+    return dedup
+
+  if dedup == 'exact':
+    return ExactFilter()
+
+  if dedup == 'bloom':
+    return BloomFilter()
+
+  raise ValueError('Unknown de-duplication mode: ' + str(dedup))
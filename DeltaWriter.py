@@ -0,0 +1,293 @@
+#!/usr/bin/env python
+
+# Content hashes
+import hashlib
+# Manifest
+import gzip
+import json
+import os
+
+# Base writer
+import CypherWriter
+
+
+#
+#
+# Constants
+CONST_Manifest_Version = 2
+CONST_Hash_Length = 16
+
+
+#
+# Writes only the changes since a previous run, instead of the whole graph.
+# Nodes are identified across runs by their natural key: properties {keys}
+# of their label (e.g. { 'Song': [ 'title' ] }), all properties but
+# {ignore} for labels without one. {manifest} holds the natural key and a
+# content hash of every node, and every relationship, of the previous run;
+# it is replaced by the current run's on `close`.
+# Properties in {ignore} (generated ids by default) are neither compared nor
+# updated, and relationships are compared as sets.
+# The same writer is used for nodes and relationships, e.g.
+# x2c.apply(o, delta, delta)
+class DeltaWriter(CypherWriter.CypherWriter):
+
+  def __init__(self, filename, manifest, keys = None, ignore = ( 'id', ), dedup = None):
+    self.manifest = manifest
+    self.keys = keys or {}
+    self.ignore = set(ignore)
+
+    # Checked before the output file is created
+    self.previousNodes, self.previousRelationships = self.loadManifest()
+
+    # Endpoint properties as dictionaries, by endpoint handle
+    self.endpointDicts = []
+
+    super().__init__(filename, dedup)
+
+    # ( label, natural key ): ( content hash, properties, merge ), last
+    # occurrence of each node of the current run
+    self.nodes = {}
+    # Natural keys of every occurrence, see `resolve`
+    self.nodeIndex = CypherWriter.NodeIndex()
+
+    self.created = 0
+    self.updated = 0
+    self.deleted = 0
+    self.unchanged = 0
+
+  #
+  # Previous run nodes { ( label, natural key ): hash } and relationships
+  # { ( src, tgt, type, properties ) }, empty if there is no manifest.
+  # Unreadable, modified or other version manifests raise ValueError.
+  def loadManifest(self):
+    if not os.path.exists(self.manifest):
+      return ( {}, set() )
+
+    try:
+      with gzip.open(self.manifest, 'rt', encoding="utf8") as fd:
+        data = json.load(fd)
+    except (OSError, ValueError) as e:
+      raise ValueError('Unreadable manifest %s: %s' % (self.manifest, e))
+
+    version = data.get('version', None) if isinstance(data, dict) else None
+    if version != CONST_Manifest_Version:
+      raise ValueError('Unsupported manifest version: ' + str(version))
+
+    if data.get('checksum', None) != self.manifestChecksum(data):
+      raise ValueError('Manifest does not match its checksum: ' + self.manifest)
+
+    keys = [ ( label, key ) for (label, key, _) in data['nodes'] ] +            \
+           [ ( label, key ) for (label, key) in data['endpoints'] ]
+    nodes = { ( label, key ): h for (label, key, h) in data['nodes'] }
+    relationships = set([
+      ( keys[src], keys[tgt], rsName, rsProps )
+      for (src, tgt, rsName, rsProps) in data['relationships']
+    ])
+
+    return ( nodes, relationships )
+
+  #
+  # Natural key of node {label}, {properties}, as a Cypher property map
+  def naturalKey(self, label, properties):
+    names = self.keys.get(label, None)
+
+    if names == None:
+      return self.flattenProperties({
+        k: v for (k, v) in properties.items() if k not in self.ignore
+      })
+
+    missing = [ k for k in names if k not in properties ]
+    if missing:
+      raise ValueError('Missing natural key %s of node %s' % (missing, label))
+
+    return self.flattenProperties({ k: properties[k] for k in names })
+
+  #
+  # Self-explanatory
+  def contentHash(self, properties):
+    content = self.flattenProperties({
+      k: v for (k, v) in properties.items() if k not in self.ignore
+    })
+
+    return hashlib.md5(content.encode('utf-8')).hexdigest()[:CONST_Hash_Length]
+
+  #
+  # Keep node until `flushRelationships`. Repeated nodes (same natural key)
+  # are compared by their last occurrence.
+  def node(self, label, properties = None, merge = False):
+    properties = properties or {}
+
+    if self.metrics:
+      self.metrics.node(label)
+
+    key = ( label, self.naturalKey(label, properties) )
+
+    self.nodes[key] = ( self.contentHash(properties), properties, merge )
+    self.nodeIndex.add(label, properties, key)
+
+  #
+  # MATCH ... SET clause replacing the properties of node {label}, {key}.
+  # Ignored properties keep their value.
+  def formatUpdate(self, label, key, properties):
+    content = {
+      k: v for (k, v) in properties.items() if k not in self.ignore
+    }
+    kept = sorted(self.ignore)
+
+    clauses = [ "MATCH (n:" + label + key + ")" ]
+
+    if kept:
+      clauses.append("WITH n, " + ", ".join([
+        "n.%s AS k%d" % (k, i) for (i, k) in enumerate(kept)
+      ]))
+
+    clauses.append("SET n = " + (self.flattenProperties(content) or "{}") + "".join([
+      ", n.%s = k%d" % (k, i) for (i, k) in enumerate(kept)
+    ]))
+
+    return "\n".join(clauses)
+
+  #
+  # Nodes, then relationships of {record}, see `CypherWriter.record`
+  def record(self, record):
+    for (label, properties, merge) in record.nodes:
+      self.node(label, properties, merge)
+
+    for (src, tgt, rsName, rsProps) in record.relationships:
+      self.relationship(
+        record.nodes[src][0], record.nodes[src][1],
+        record.nodes[tgt][0], record.nodes[tgt][1],
+        rsName, rsProps
+      )
+
+  #
+  # Keep endpoint properties, see `resolve`
+  def endpoint(self, label, props):
+    handle = super().endpoint(label, props)
+
+    if handle == len(self.endpointDicts):
+      self.endpointDicts.append(props)
+
+    return handle
+
+  #
+  # Natural keys of the nodes pending relationships point to, by endpoint
+  # handle. Endpoints matching no node of this run are identified by their
+  # own properties.
+  def resolve(self):
+    return [
+      self.nodeIndex.find(label, props) or ( label, self.flattenProperties(props) )
+      for (label, props) in zip(self.endpointLabels, self.endpointDicts)
+    ]
+
+  #
+  # Create new nodes, update changed ones, delete nodes and relationships of
+  # the previous run which are gone, and create new relationships
+  def flushRelationships(self):
+    for (key, (h, properties, merge)) in self.nodes.items():
+      previous = self.previousNodes.get(key, None)
+
+      if previous == h:
+        self.unchanged += 1
+
+      elif previous == None:
+        self.created += 1
+        self.updateTransaction()
+        self.write(self.formatNode(key[0], properties, merge))
+
+      else:
+        self.updated += 1
+        self.updateTransaction()
+        self.write(self.formatUpdate(key[0], key[1], properties))
+
+    keys = self.resolve()
+
+    relationships = set([
+      (
+        keys[self.rsSrc[i]], keys[self.rsTgt[i]],
+        self.stringList[self.rsType[i]], self.stringList[self.rsPropsIdx[i]]
+      )
+      for i in range(len(self.rsSrc))
+    ])
+
+    # Relationships of deleted nodes are detached with them
+    deleted = set([ key for key in self.previousNodes if key not in self.nodes ])
+
+    for key in self.previousNodes:
+      if key in deleted:
+        self.deleted += 1
+        self.updateTransaction()
+        self.write("MATCH (n:%s%s)\nDETACH DELETE n" % key)
+
+    for (src, tgt, rsName, rsProps) in sorted(self.previousRelationships - relationships):
+      if src not in deleted and tgt not in deleted:
+        self.updateTransaction()
+        self.write(
+          "MATCH (a:%s%s)-[r:%s%s]->(b:%s%s)\nDELETE r" %
+          (src + ( rsName, rsProps ) + tgt)
+        )
+
+    for (src, tgt, rsName, rsProps) in sorted(relationships - self.previousRelationships):
+      self.updateTransaction()
+      self.write(
+        "MATCH (a:%s%s)\nMATCH (b:%s%s)\nCREATE (a)-[:%s%s]->(b)" %
+        (src + tgt + ( rsName, rsProps ))
+      )
+
+    self.writeManifest(relationships)
+    self.clearRelationships()
+    self.endpointDicts = []
+    self.nodes = {}
+    self.nodeIndex = CypherWriter.NodeIndex()
+
+  #
+  # Content hash of manifest {data}
+  def manifestChecksum(self, data):
+    content = json.dumps(
+      [ data.get(k, None) for k in ( 'nodes', 'endpoints', 'relationships' ) ],
+      separators = ( ',', ':' )
+    )
+
+    return hashlib.md5(content.encode('utf-8')).hexdigest()
+
+  #
+  # Replace manifest with the current run's
+  def writeManifest(self, relationships):
+    nodes = [ ( key, h ) for (key, (h, _, _)) in self.nodes.items() ]
+    indexes = { key: i for (i, (key, _)) in enumerate(nodes) }
+
+    # Endpoints out of this run's nodes follow nodes
+    endpoints = []
+    for (src, tgt, _, _) in relationships:
+      for key in ( src, tgt ):
+        if key not in indexes:
+          indexes[key] = len(nodes) + len(endpoints)
+          endpoints.append(key)
+
+    data = {
+      'version': CONST_Manifest_Version,
+      'nodes': [ [ label, key, h ] for ((label, key), h) in nodes ],
+      'endpoints': [ [ label, key ] for (label, key) in endpoints ],
+      'relationships': [
+        [ indexes[src], indexes[tgt], rsName, rsProps ]
+        for (src, tgt, rsName, rsProps) in sorted(relationships)
+      ]
+    }
+    data['checksum'] = self.manifestChecksum(data)
+
+    # Write aside then rename, so a failed run leaves the previous one
+    tmpFilename = self.manifest + '.tmp'
+    with gzip.open(tmpFilename, 'wt', encoding="utf8") as fd:
+      json.dump(data, fd, separators = ( ',', ':' ))
+
+    os.replace(tmpFilename, self.manifest)
+
+  #
+  # Counts of changes written
+  def report(self):
+    return {
+      'created': self.created,
+      'updated': self.updated,
+      'deleted': self.deleted,
+      'unchanged': self.unchanged
+    }
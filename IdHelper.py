@@ -1,5 +1,18 @@
 #!/usr/bin/env python
 
+# Hashed ids
+import hashlib
+import json
+
+
+#
+#
+# Constants
+
+# Hashed ids kept to detect collisions, see HashIdHelper
+CONST_Max_Seen = 1000000
+
+
 class IdHelper:
   idDict = {}
   
@@ -10,4 +23,73 @@ class IdHelper:
     newId = self.idDict[label] + 1
     self.idDict[label] = newId
     
-    return newId
\ No newline at end of file
+    return newId
+
+
+#
+# Allocates ids in blocks of {blockSize} from counters shared between
+# processes, e.g. a multiprocessing.Manager dictionary and lock. Ids are
+# unique across processes, and sequential within a block.
+class BlockIdHelper:
+  
+  def __init__(self, counters, lock, blockSize = 1024):
+    self.counters = counters
+    self.lock = lock
+    self.blockSize = blockSize
+    # {label}: [next id, end of block]
+    self.blocks = {}
+  
+  def new(self, label):
+    block = self.blocks.get(label, None)
+    
+    if not block or block[0] >= block[1]:
+      with self.lock:
+        start = self.counters.get(label, 1)
+        self.counters[label] = start + self.blockSize
+      
+      block = self.blocks[label] = [ start, start + self.blockSize ]
+    
+    newId = block[0]
+    block[0] += 1
+    
+    return newId
+
+
+#
+# Derives ids from content instead of counters: the same {key} (any
+# JSON-serializable value, e.g. property values) always gets the same 63-bit
+# id for a given label, whatever the input order or process. With
+# {checkCollisions}, ids handed out for different keys are detected using a
+# second, independent hash. Only ids handed out by this helper, i.e. in this
+# process, are checked, and at most the first {maxSeen} of them are kept in
+# memory: later ids are still checked against those.
+class HashIdHelper:
+  
+  def __init__(self, checkCollisions = True, maxSeen = CONST_Max_Seen):
+    self.checkCollisions = checkCollisions
+    self.maxSeen = maxSeen
+    # {label}: { id: check hash }
+    self.seen = {}
+    self.seenCount = 0
+  
+  def new(self, label, key):
+    data = json.dumps([ label, key ], separators = ( ',', ':' ), default = str)
+    digest = hashlib.blake2b(data.encode('utf-8'), digest_size = 16).digest()
+    
+    # Positive 64-bit signed integer, as Neo4j stores integers
+    newId = int.from_bytes(digest[:8], 'big') >> 1
+    
+    if self.checkCollisions:
+      check = int.from_bytes(digest[8:], 'big')
+      seen = self.seen.setdefault(label, {})
+      seenCheck = seen.get(newId, None)
+      
+      if seenCheck == None:
+        if self.seenCount < self.maxSeen:
+          seen[newId] = check
+          self.seenCount += 1
+      
+      elif seenCheck != check:
+        raise ValueError('Hash id collision for %s %s: %d' % (label, data, newId))
+    
+    return newId
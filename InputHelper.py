@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+
+# Compression codecs
+import bz2
+import gzip
+import lzma
+# Memory-mapped uncompressed input
+import mmap
+# Projected parsing
+from xml.parsers import expat
+# xmltodict-compatible output
+from collections import OrderedDict
+
+
+#
+#
+# Constants
+
+# Codecs detected by magic bytes: ( magic, name, open )
+CONST_Codecs = [
+  ( b'\x1f\x8b', 'gzip', gzip.open ),
+  ( b'BZh', 'bz2', bz2.open ),
+  ( b'\xfd7zXZ\x00', 'xz', lzma.open )
+]
+CONST_Magic_Length = max([ len(magic) for (magic, _, _) in CONST_Codecs ])
+# Bytes fed to the parser at once, see `parseProjected`
+CONST_Chunk_Size = 1 << 20
+
+
+#
+# Name of the compression codec of {filename}, None if uncompressed
+def detectCodec(filename):
+  with open(filename, 'rb') as fd:
+    header = fd.read(CONST_Magic_Length)
+
+  for (magic, name, _) in CONST_Codecs:
+    if header.startswith(magic):
+      return name
+
+  return None
+
+
+#
+# Binary file object over an XML input: decompressed in streaming chunks if
+# compressed (see CONST_Codecs), memory-mapped otherwise. Bytes read are
+# reported to {metrics}, see `Metrics.addInputBytes`
+class InputFile:
+
+  def __init__(self, filename, metrics = None):
+    self.filename = filename
+    self.metrics = metrics
+    self.codec = detectCodec(filename)
+    self.map = None
+
+    if self.codec:
+      opener = [ o for (_, name, o) in CONST_Codecs if name == self.codec ][0]
+      self.file = opener(filename, 'rb')
+
+    else:
+      self.file = open(filename, 'rb')
+
+      # Empty files can't be mapped
+      try:
+        self.map = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ)
+      except ValueError:
+        pass
+
+  def read(self, size = -1):
+    buff = (self.map or self.file).read(size)
+
+    if self.metrics:
+      self.metrics.addInputBytes(len(buff))
+
+    return buff
+
+  def close(self):
+    if self.map:
+      self.map.close()
+
+    self.file.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+
+#
+# Elements and attributes of a document a schema may read, as a tree rooted
+# above the document element. See `SchemaAnalysis.projection`
+class Projection:
+
+  def __init__(self, keepAll = False):
+    # {element name}: Projection
+    self.children = {}
+    # Attribute names, without '@'
+    self.attributes = set()
+    # Keep the whole subtree
+    self.keepAll = keepAll
+    # Whether the element is read as a collection (True), or not (False)
+    self.uses = set()
+
+  def child(self, name):
+    if not name in self.children:
+      self.children[name] = Projection()
+
+    return self.children[name]
+
+  #
+  # Projection of child element {name}, None if it is skipped. Descendants
+  # of kept subtrees are parsed exactly as xmltodict does.
+  def select(self, name):
+    if self.keepAll:
+      return KeepAll
+
+    return self.children.get(name, None)
+
+  #
+  # Elements only read as collections are always wrapped in a list
+  def forceList(self):
+    return self.uses == { True }
+
+  #
+  # Self-explanatory, e.g. [ 'songs/song[]/@tags', 'songs/song[]/title/*' ]
+  def paths(self, prefix = ''):
+    if self.keepAll:
+      return [ prefix + '/*' ]
+
+    paths = [ prefix + '/@' + a for a in sorted(self.attributes) ]
+
+    for (name, child) in self.children.items():
+      childPrefix = (prefix + '/' if prefix else '') + name + ('[]' if child.forceList() else '')
+      paths += child.paths(childPrefix) or [ childPrefix ]
+
+    return paths
+
+# Shared projection of elements inside kept subtrees
+KeepAll = Projection(True)
+
+#
+# Builds the same dictionaries as xmltodict out of expat events, for the
+# elements and attributes of a Projection only. Skipped subtrees cost one
+# counter update per event.
+class ProjectedBuilder:
+
+  def __init__(self, projection):
+    self.projection = projection
+    self.result = None
+    # [ projection, name, item, data ]
+    self.stack = []
+    # Depth inside a skipped subtree
+    self.skipDepth = 0
+
+  def start(self, name, attrs):
+    if self.skipDepth:
+      self.skipDepth += 1
+      return
+
+    parent = self.stack[-1][0] if self.stack else self.projection
+    projection = parent.select(name)
+
+    if projection == None:
+      self.skipDepth = 1
+      return
+
+    item = None
+
+    if attrs:
+      item = OrderedDict([
+        ( '@' + attrs[i], attrs[i + 1] )
+        for i in range(0, len(attrs), 2)
+        if projection.keepAll or attrs[i] in projection.attributes
+      ]) or None
+
+    self.stack.append([ projection, name, item, [] ])
+
+  def end(self, name):
+    if self.skipDepth:
+      self.skipDepth -= 1
+      return
+
+    projection, name, item, data = self.stack.pop()
+    data = ''.join(data).strip() or None
+
+    if item == None:
+      item = data
+
+    elif data:
+      item['#text'] = data
+
+    if not self.stack:
+      self.result = OrderedDict([ ( name, item ) ])
+      return
+
+    parent = self.stack[-1]
+
+    if parent[2] == None:
+      parent[2] = OrderedDict()
+
+    siblings = parent[2]
+
+    if name in siblings:
+      if isinstance(siblings[name], list):
+        siblings[name].append(item)
+      else:
+        siblings[name] = [ siblings[name], item ]
+
+    else:
+      siblings[name] = [ item ] if projection.forceList() else item
+
+  def characters(self, data):
+    if not self.skipDepth and self.stack:
+      self.stack[-1][3].append(data)
+
+#
+# Parse binary file object {fd} into a dictionary, keeping only the elements
+# and attributes of {projection}, see ProjectedBuilder
+def parseProjected(fd, projection, chunkSize = CONST_Chunk_Size):
+  builder = ProjectedBuilder(projection)
+
+  parser = expat.ParserCreate()
+  parser.ordered_attributes = True
+  parser.buffer_text = True
+  parser.StartElementHandler = builder.start
+  parser.EndElementHandler = builder.end
+  parser.CharacterDataHandler = builder.characters
+  # Entities aren't expanded, as with xmltodict
+  parser.DefaultHandler = lambda x: None
+  parser.ExternalEntityRefHandler = lambda *x: 1
+
+  while True:
+    chunk = fd.read(chunkSize)
+
+    if not chunk:
+      break
+
+    parser.Parse(chunk, False)
+
+  parser.Parse(b'', True)
+
+  return builder.result
+
+#
+# Parse XML file {filename} into a dictionary, see InputFile. With
+# {projection}, elements and attributes out of it are skipped while parsing,
+# reading {chunkSize} bytes at once.
+def loadDocument(filename, metrics = None, projection = None, chunkSize = CONST_Chunk_Size):
+  with InputFile(filename, metrics) as fd:
+    if projection:
+      return parseProjected(fd, projection, chunkSize)
+
+    # Xml : dictionary mapping
+    import xmltodict
+
+    return xmltodict.parse(fd)
@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+
+# Default encoder
+import json
+
+# Faster encoder, if available
+try:
+  import orjson
+except ImportError:
+  orjson = None
+
+# Base writer
+import CypherWriter
+
+
+#
+#
+# Constants
+CONST_Batch_Size = 10000
+
+
+#
+# Self-explanatory, values which can't be encoded are converted to strings
+def encode(o):
+  if orjson:
+    return orjson.dumps(o, default = str).decode('utf-8')
+
+  return json.dumps(o, separators = ( ',', ':' ), ensure_ascii = False, default = str)
+
+
+#
+# Writes nodes and relationships as JSON lines in the format of
+# apoc.export.json, to be loaded with apoc.import.json or iterated over by
+# apoc.periodic.iterate. Property values keep the types of the schema (int,
+# float, boolean, string).
+# Nodes are written in runs of up to {batchSize} lines of the same label,
+# relationships are resolved against written nodes on `close` and written
+# grouped by type: relationships matching no node of the file raise a
+# ValueError, as the format can't refer to them. The same writer is used for nodes and relationships, e.g.
+# x2c.apply(o, writer, writer)
+class JsonLinesWriter(CypherWriter.CypherWriter):
+
+  def __init__(self, filename, batchSize = CONST_Batch_Size, dedup = None, bufferSize = -1):
+    self.batchSize = batchSize
+
+    # Endpoint properties as dictionaries, by endpoint handle
+    self.endpointDicts = []
+
+    super().__init__(filename, dedup, bufferSize = bufferSize)
+
+    # {label}: [ encoded nodes ], see `flushNodes`
+    self.nodeBuffers = {}
+    # Node ids, see `resolve`
+    self.nodeIndex = CypherWriter.NodeIndex()
+    # ( label, encoded properties ): id, of merged nodes
+    self.merged = {}
+    self.nodeCount = 0
+
+  #
+  # Write {line}
+  def writeLine(self, line):
+    self.cmdCounter += 1
+    self.write(line + "\n")
+
+  #
+  # Buffer node, merged nodes with the same properties are written once
+  def node(self, label, properties = None, merge = False):
+    properties = properties or {}
+
+    if self.metrics:
+      self.metrics.node(label)
+
+    encoded = encode(properties)
+
+    if merge:
+      key = ( label, encoded )
+
+      if key in self.merged:
+        return
+
+      self.merged[key] = self.nodeCount
+
+    nodeId = self.nodeCount
+    self.nodeCount += 1
+    self.nodeIndex.add(label, properties, nodeId)
+
+    buff = self.nodeBuffers.setdefault(label, [])
+    buff.append(
+      '{"type":"node","id":"%d","labels":%s,"properties":%s}' %
+      (nodeId, encode([ label ]), encoded)
+    )
+
+    if len(buff) >= self.batchSize:
+      self.flushNodes(label)
+
+  #
+  # Write buffered nodes of {label}, of all labels if None
+  def flushNodes(self, label = None):
+    for l in [ label ] if label != None else list(self.nodeBuffers.keys()):
+      for line in self.nodeBuffers.pop(l, []):
+        self.writeLine(line)
+
+  #
+  # Nodes, then relationships of {record}, see `CypherWriter.record`
+  def record(self, record):
+    for (label, properties, merge) in record.nodes:
+      self.node(label, properties, merge)
+
+    for (src, tgt, rsName, rsProps) in record.relationships:
+      self.relationship(
+        record.nodes[src][0], record.nodes[src][1],
+        record.nodes[tgt][0], record.nodes[tgt][1],
+        rsName, rsProps
+      )
+
+  #
+  # Keep endpoint properties, see `resolve`
+  def endpoint(self, label, props):
+    handle = super().endpoint(label, props)
+
+    if handle == len(self.endpointDicts):
+      self.endpointDicts.append(props)
+
+    return handle
+
+  #
+  # Relationship properties are kept encoded as JSON, see
+  # `CypherWriter.relationship`
+  def relationship(self,
+                   nodeLbl1, nodeProps1,
+                   nodeLbl2, nodeProps2,
+                   rsName, rsProps = None):
+    src = self.endpoint(nodeLbl1, nodeProps1)
+    tgt = self.endpoint(nodeLbl2, nodeProps2)
+
+    if not self.addRelationship(
+      src, tgt, self.intern(rsName), self.intern(encode(rsProps or {}))
+    ):
+      return
+
+    if self.metrics:
+      self.metrics.relationship(rsName)
+
+  #
+  # Lists of the ids of the nodes each endpoint matches, by endpoint handle:
+  # empty for endpoints matching no node of this file, several when nodes
+  # share the endpoint's properties.
+  def resolve(self):
+    return [
+      self.nodeIndex.findAll(label, props)
+      for (label, props) in zip(self.endpointLabels, self.endpointDicts)
+    ]
+
+  #
+  # Write remaining nodes, then pending relationships grouped by type. As
+  # with Cypher's MATCH, a relationship is written between every pair of
+  # nodes its endpoints match.
+  def flushRelationships(self):
+    self.flushNodes()
+
+    ids = self.resolve()
+    unresolved = [
+      i for i in range(len(self.rsSrc))
+      if not ids[self.rsSrc[i]] or not ids[self.rsTgt[i]]
+    ]
+
+    if unresolved:
+      i = unresolved[0]
+      h = self.rsSrc[i] if not ids[self.rsSrc[i]] else self.rsTgt[i]
+
+      raise ValueError(
+        '%d relationships match no node of this file, e.g. %s to %s%s' % (
+          len(unresolved), self.stringList[self.rsType[i]],
+          self.endpointLabels[h], encode(self.endpointDicts[h])
+        )
+      )
+
+    endpoints = [
+      [ '{"id":"%d","labels":%s}' % (nodeId, encode([ label ])) for nodeId in nodeIds ]
+      for (nodeIds, label) in zip(ids, self.endpointLabels)
+    ]
+
+    order = sorted(range(len(self.rsSrc)), key = lambda i: self.rsType[i])
+    rsId = 0
+
+    for i in order:
+      for src in endpoints[self.rsSrc[i]]:
+        for tgt in endpoints[self.rsTgt[i]]:
+          self.writeLine(
+            '{"type":"relationship","id":"%d","label":%s,"properties":%s,"start":%s,"end":%s}' %
+            (
+              rsId, encode(self.stringList[self.rsType[i]]),
+              self.stringList[self.rsPropsIdx[i]], src, tgt
+            )
+          )
+          rsId += 1
+
+    self.clearRelationships()
+    self.endpointDicts = []
+
+  #
+  # Write nodes and relationships, close file
+  def close(self):
+    try:
+      self.flushRelationships()
+
+    finally:
+      if self.ownsFile:
+        self.file.close()
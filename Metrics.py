@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+
+# Timing
+import time
+# JSON-lines exporter
+import json
+# Atomic textfile replacement
+import os
+# Platform detection for RSS units
+import sys
+
+# Resource usage (unavailable on Windows)
+try:
+  import resource
+except ImportError:
+  resource = None
+
+
+#
+# Resident set size of the current process, in bytes (0 if unavailable)
+def currentRss():
+  try:
+    with open('/proc/self/statm') as fd:
+      return int(fd.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+  except (OSError, ValueError, IndexError, AttributeError):
+    if not resource:
+      return 0
+
+    # Fallback on peak RSS: kilobytes on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+#
+# Appends one JSON object per report to {filename}
+class JsonLinesExporter:
+
+  def __init__(self, filename):
+    self.file = open(filename, "a", encoding="utf8")
+
+  def export(self, snapshot):
+    self.file.write(json.dumps(snapshot, sort_keys = True) + "\n")
+    self.file.flush()
+
+  def close(self):
+    self.file.close()
+
+
+#
+# Rewrites {filename} in the Prometheus textfile format on each report,
+# suitable for node_exporter's textfile collector
+class PrometheusExporter:
+
+  def __init__(self, filename, prefix = 'x2c'):
+    self.filename = filename
+    self.prefix = prefix
+
+  def formatLabels(self, labels):
+    return "{" + ",".join([
+      '%s="%s"' % (k, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+      for (k, v) in labels.items()
+    ]) + "}"
+
+  def formatMetric(self, name, kind, value, labels = None):
+    name = self.prefix + '_' + name
+    return "# TYPE %s %s\n%s%s %s\n" % (
+      name, kind, name, self.formatLabels(labels) if labels else "", value
+    )
+
+  def export(self, snapshot):
+    lines = [
+      self.formatMetric('records_total', 'counter', snapshot['records']),
+      self.formatMetric('input_bytes_total', 'counter', snapshot['inputBytes']),
+      self.formatMetric('records_per_second', 'gauge', snapshot['rate']),
+      self.formatMetric('pending_relationships', 'gauge', snapshot['pendingRelationships']),
+      self.formatMetric('duplicate_relationships_total', 'counter', snapshot['duplicateRelationships']),
+      self.formatMetric('rss_bytes', 'gauge', snapshot['rss']),
+      self.formatMetric('elapsed_seconds', 'gauge', snapshot['elapsed'])
+    ]
+
+    name = self.prefix + '_nodes_total'
+    lines.append("# TYPE %s counter\n" % name)
+    for (label, count) in snapshot['nodes'].items():
+      lines.append("%s%s %s\n" % (name, self.formatLabels({ 'label': label }), count))
+
+    name = self.prefix + '_relationships_total'
+    lines.append("# TYPE %s counter\n" % name)
+    for (rsName, count) in snapshot['relationships'].items():
+      lines.append("%s%s %s\n" % (name, self.formatLabels({ 'type': rsName }), count))
+
+    # Write aside then rename, so scrapers never read a partial file
+    tmpFilename = self.filename + '.tmp'
+    with open(tmpFilename, "w", encoding="utf8") as fd:
+      fd.write("".join(lines))
+
+    os.replace(tmpFilename, self.filename)
+
+  def close(self):
+    pass
+
+
+#
+# Collects progress and throughput counters while a schema is applied.
+# {callback} receives a snapshot dictionary every {interval} seconds, and so
+# do {exporters} (see JsonLinesExporter, PrometheusExporter).
+class Metrics:
+
+  def __init__(self, callback = None, interval = 5.0, exporters = None):
+    self.callback = callback
+    self.interval = interval
+    self.exporters = exporters or []
+
+    self.records = 0
+    self.inputBytes = 0
+    self.nodes = {}
+    self.relationships = {}
+
+    self.writers = []
+
+    self.startTime = time.monotonic()
+    self.lastTime = self.startTime
+    self.lastRecords = 0
+
+  #
+  # Have {writer} report its nodes, relationships and pending buffer size
+  def attach(self, writer):
+    if writer not in self.writers:
+      self.writers.append(writer)
+
+    writer.metrics = self
+
+  #
+  # Account for {count} input bytes read, see `InputHelper.InputFile`.
+  # Reports are also due while parsing, before the first record.
+  def addInputBytes(self, count):
+    self.inputBytes += count
+    self.tick()
+
+  #
+  # Self-explanatory
+  def record(self):
+    self.records += 1
+    self.tick()
+
+  def node(self, label):
+    self.nodes[label] = self.nodes.get(label, 0) + 1
+
+  def relationship(self, rsName):
+    self.relationships[rsName] = self.relationships.get(rsName, 0) + 1
+
+  #
+  # Report if at least {interval} seconds elapsed since the last report
+  def tick(self):
+    if time.monotonic() - self.lastTime >= self.interval:
+      self.report()
+
+  def snapshot(self):
+    now = time.monotonic()
+    elapsed = now - self.startTime
+    interval = now - self.lastTime
+
+    return {
+      'time': time.time(),
+      'elapsed': elapsed,
+      'records': self.records,
+      'inputBytes': self.inputBytes,
+      'nodes': dict(self.nodes),
+      'relationships': dict(self.relationships),
+      'nodesTotal': sum(self.nodes.values()),
+      'relationshipsTotal': sum(self.relationships.values()),
+      'rate': (self.records - self.lastRecords) / interval if interval > 0 else 0.0,
+      'averageRate': self.records / elapsed if elapsed > 0 else 0.0,
+      'pendingRelationships': sum([ w.pendingCount for w in self.writers ]),
+      'duplicateRelationships': sum([ w.duplicates for w in self.writers ]),
+      'rss': currentRss()
+    }
+
+  #
+  # Send a snapshot to callback and exporters
+  def report(self):
+    snapshot = self.snapshot()
+
+    self.lastTime = time.monotonic()
+    self.lastRecords = self.records
+
+    if self.callback:
+      self.callback(snapshot)
+
+    for exporter in self.exporters:
+      exporter.export(snapshot)
+
+    return snapshot
+
+  #
+  # Final report, close exporters
+  def close(self):
+    snapshot = self.report()
+
+    for exporter in self.exporters:
+      exporter.close()
+
+    return snapshot
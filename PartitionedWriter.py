@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+
+# Partition files and manifest
+import json
+import os
+
+# Base writer
+import CypherWriter
+
+
+#
+#
+# Constants
+CONST_Manifest_Version = 1
+CONST_Partitions = 4
+CONST_Phases = 4
+
+
+#
+# Relationship writer splitting relationships into files which can be
+# loaded concurrently without two sessions locking the same node.
+# Relationships are written in phases, loaded one after the other. Each
+# phase has up to {partitions} files, and no endpoint appears in two files
+# of the same phase: the files of a phase can be run by as many concurrent
+# sessions. Relationships left after {phases} phases, e.g. those of a node
+# linked to many others, are written to {filename} itself, to be loaded
+# alone last.
+# Partition files are named {name}-{phase}-{partition}.cql after {filename}
+# ({name}.cql), and {name}.json describes the phases, see `writeManifest`.
+# Endpoints are told apart by the properties identifying them. As the same
+# node could be matched by different properties, relationships to a label
+# matched by more than one set of property names are left to {filename}.
+# Relationships are partitioned once, on `close`. See
+# `CypherWriter.CypherWriter` for other arguments.
+class PartitionedWriter(CypherWriter.CypherWriter):
+
+  def __init__(self, filename, partitions = CONST_Partitions, phases = CONST_Phases,
+               dedup = None, transactionSize = None, bufferSize = -1,
+               order = None, compact = False):
+    self.partitions = partitions
+    self.phases = phases
+
+    self.basename = os.path.splitext(filename)[0]
+    self.manifest = self.basename + '.json'
+    # Files written, see `writeManifest`
+    self.phaseFiles = []
+    self.phaseCounts = []
+    self.serialCount = 0
+
+    super().__init__(filename, dedup, transactionSize, bufferSize, order, compact)
+
+  #
+  # Split relationships {indices} in phases. Returns the list of phases (lists
+  # of partitions, lists of relationship indices), and relationships left.
+  # Relationships are assigned greedily in order: to the partition one of
+  # their endpoints already belongs to in the current phase, or the least
+  # loaded one. Partitions hold at most their share of the relationships
+  # left, so that a hub doesn't draw everything into one partition; the
+  # relationships which don't fit, or whose endpoints belong to different
+  # partitions, are deferred to the next phase.
+  def partition(self, indices):
+    ambiguous = self.ambiguousLabels()
+    serial = set([
+      i for i in indices
+      if self.endpointLabels[self.rsSrc[i]] in ambiguous or
+         self.endpointLabels[self.rsTgt[i]] in ambiguous
+    ])
+
+    phases = []
+    left = [ i for i in indices if i not in serial ]
+
+    while left and len(phases) < self.phases:
+      capacity = -(-len(left) // self.partitions)
+      owners = {}
+      loads = [ 0 ] * self.partitions
+      parts = [ [] for _ in range(self.partitions) ]
+      deferred = []
+
+      for i in left:
+        src = owners.get(self.rsSrc[i], None)
+        tgt = owners.get(self.rsTgt[i], None)
+
+        if src != None and tgt != None and src != tgt:
+          deferred.append(i)
+          continue
+
+        k = src if src != None else tgt
+        if k == None:
+          k = loads.index(min(loads))
+
+        if loads[k] >= capacity:
+          deferred.append(i)
+          continue
+
+        owners[self.rsSrc[i]] = owners[self.rsTgt[i]] = k
+        loads[k] += 1
+        parts[k].append(i)
+
+      # A single partition is no faster than the final serial phase
+      if len([ p for p in parts if p ]) < 2:
+        break
+
+      phases.append([ p for p in parts if p ])
+      left = deferred
+
+    serial |= set(left)
+
+    return ( phases, [ i for i in indices if i in serial ] )
+
+  #
+  # Labels of endpoints identified by different sets of property names
+  def ambiguousLabels(self):
+    names = {}
+
+    for (label, keys) in zip(self.endpointLabels, self.endpointKeys):
+      names.setdefault(label, set()).add(keys)
+
+    return set([ label for (label, keys) in names.items() if len(keys) > 1 ])
+
+  #
+  # Write relationships of each phase to their partition files, the others
+  # to this writer's file
+  def flushRelationships(self):
+    if not len(self.rsSrc):
+      return
+
+    if self.phaseCounts or self.serialCount:
+      raise ValueError('Partitioned relationships can only be flushed once')
+
+    hashes = self.endpointHashes()
+    varNames = self.endpointNames(hashes)
+
+    phases, left = self.partition(self.relationshipOrder(hashes))
+
+    for (phase, parts) in enumerate(phases):
+      files = []
+
+      for (k, indices) in enumerate(parts):
+        filename = '%s-%d-%d.cql' % (self.basename, phase, k)
+        writer = CypherWriter.CypherWriter(
+          filename, transactionSize = self.transactionSize, compact = self.compact
+        )
+
+        for i in indices:
+          writer.updateTransaction()
+          writer.write(self.formatRelationship(i, varNames))
+
+        writer.close()
+        files.append(filename)
+
+      self.phaseFiles.append(files)
+      self.phaseCounts.append([ len(indices) for indices in parts ])
+
+    for i in left:
+      self.updateTransaction()
+      self.write(self.formatRelationship(i, varNames))
+
+    self.serialCount = len(left)
+    self.clearRelationships()
+
+  #
+  # Write {name}.json:
+  # { "version": 1, "phases": [ { "files": [ ... ], "relationships": [ ... ],
+  #   "serial": false }, ... ] }
+  # Phases are loaded in order, files of a phase concurrently. The last phase
+  # is this writer's file, with "serial": true. File names are relative to
+  # the manifest.
+  def writeManifest(self):
+    phases = [
+      {
+        'files': [ os.path.basename(f) for f in files ],
+        'relationships': counts,
+        'serial': False
+      }
+      for (files, counts) in zip(self.phaseFiles, self.phaseCounts)
+    ]
+
+    phases.append({
+      'files': [ os.path.basename(self.file.name) ],
+      'relationships': [ self.serialCount ],
+      'serial': True
+    })
+
+    with open(self.manifest, "w", encoding="utf8") as fd:
+      json.dump({ 'version': CONST_Manifest_Version, 'phases': phases }, fd, indent = 2)
+
+  #
+  # Files written, in loading order
+  def outputs(self):
+    return [ f for files in self.phaseFiles for f in files ] +                \
+           [ self.file.name, self.manifest ]
+
+  def close(self):
+    super().close()
+    self.writeManifest()
@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+
+# Schema internals
+import Xml2Cypher
+# Projection tree
+import InputHelper
+
+
+#
+#
+# Constants
+
+# Return types whose values can't be mistaken for elements once expanded in
+# a path, see ProjectionAnalysis.visitPath
+CONST_Literal_Types = {
+  Xml2Cypher.PrimitiveTypes.int.name,
+  Xml2Cypher.PrimitiveTypes.float.name,
+  Xml2Cypher.PrimitiveTypes.boolean.name,
+  Xml2Cypher.PrimitiveTypes.id.name
+}
+
+
+#
+#
+# Utils
+
+#
+# Every SchemaNode and SchemaRelationship of {x2c}: schema roots, structures
+# and their descendants
+def iterNodes(x2c):
+  stack = list(x2c.root.children)
+
+  for types in x2c.context.types.values():
+    stack += [ t for t in types if isinstance(t, Xml2Cypher.SchemaNode) ]
+
+  seen = set()
+
+  while stack:
+    node = stack.pop()
+
+    if id(node) in seen:
+      continue
+
+    seen.add(id(node))
+    yield node
+
+    if isinstance(node, Xml2Cypher.SchemaNode):
+      stack += node.children
+
+#
+# Every SchemaProperty declared by {node}
+def nodeProperties(node):
+  if isinstance(node, Xml2Cypher.SchemaRelationship):
+    return node.srcNodeProps + node.tgtNodeProps + node.rsProperties
+
+  return node.properties + node.returnTypeProperties
+
+#
+# Real types of the values each variable alias may hold
+def aliasTypes(x2c):
+  types = {}
+
+  for node in iterNodes(x2c):
+    for prop in nodeProperties(node):
+      if prop.alias:
+        types.setdefault(prop.alias, set()).add(prop.getRealType(x2c.context))
+
+  return types
+
+#
+# Split the first token out of {path}, as SchemaBaseValue.traversePath does
+def splitToken(path):
+  m = Xml2Cypher.RE_Token_Split.match(path)
+  if m:
+    return ( m.group(1), m.group(2) )
+
+  m = Xml2Cypher.RE_Token.match(path)
+  if m:
+    return ( m.group(1), '_' if m.group(1) != '_' else None )
+
+  return ( None, None )
+
+
+#
+#
+# Core
+
+#
+# Computes the Projection of the documents a schema may read, by walking its
+# nodes as SchemaNode.apply would. Whenever a path can't be resolved ahead of
+# time, the whole subtree is kept.
+class ProjectionAnalysis:
+
+  def __init__(self, x2c):
+    self.context = x2c.context
+    self.root = InputHelper.Projection()
+    self.visited = set()
+    # Names of the types being visited, see visitType
+    self.typeStack = []
+
+    # Variables which always hold literals
+    self.literalAliases = set([
+      alias for (alias, types) in aliasTypes(x2c).items()
+      if types <= CONST_Literal_Types
+    ])
+
+    for node in x2c.root.children:
+      self.visitNode(node, self.root)
+
+  #
+  # Projection of child element {name} of {projection}. None stands for data
+  # which doesn't come from the document.
+  def child(self, projection, name, isCollection):
+    if projection == None or projection.keepAll:
+      return projection
+
+    child = projection.child(name)
+    child.uses.add(isCollection)
+
+    return child
+
+  def visitNode(self, node, projection):
+    key = ( id(node), id(projection) )
+
+    if key in self.visited:
+      return
+
+    self.visited.add(key)
+
+    if isinstance(node, Xml2Cypher.SchemaRelationship):
+      for prop in nodeProperties(node):
+        self.visitPath(prop.path, projection)
+
+      return
+
+    # Element the node applies to, see SchemaNode.apply
+    if node.returnType or not node.tag:
+      element = projection
+
+    # Variables hold values computed from paths visited elsewhere
+    elif '${' in node.tag:
+      element = None
+
+    else:
+      element = self.child(projection, node.tag, node.isCollection)
+
+    # Bare @HASHID hashes the whole element: keep it as parsed without
+    # projection, so that ids don't depend on what the schema reads
+    if node.hashId == [] and element != None:
+      element.keepAll = True
+
+    # Overloads, see SchemaDispatcher
+    if node.dispatcher:
+      for overload in node.dispatcher.nodes:
+        self.visitNode(overload, projection)
+
+    # Text is always kept
+    for discriminator in node.discriminators:
+      if discriminator.token != '_':
+        self.visitPath(discriminator.token, element)
+
+    for prop in nodeProperties(node):
+      self.visitPath(prop.path, element)
+
+    if node.returnType:
+      self.visitType(node.returnType, element)
+
+    for child in node.children:
+      self.visitNode(child, element)
+
+  #
+  # Recursive structures apply to elements nested at any depth: their
+  # subtree is kept whole once the type comes back round
+  def visitType(self, name, projection):
+    if name in self.typeStack:
+      if projection != None:
+        projection.keepAll = True
+
+      return
+
+    self.typeStack.append(name)
+
+    try:
+      for t in self.context.types.get(name, []):
+        if isinstance(t, Xml2Cypher.SchemaNode):
+          self.visitNode(t, projection)
+
+        else:
+          self.visitPath(t.path, projection)
+
+    finally:
+      self.typeStack.pop()
+
+  #
+  # Mark elements and attributes {path} reads, see SchemaBaseValue.traversePath
+  def visitPath(self, path, projection):
+    while path and projection != None and not projection.keepAll:
+      # Variables holding literals are expanded to literals, see expandVar
+      if '${' in path:
+        m = Xml2Cypher.RE_Variable.match(path)
+
+        if not m or m.group(1).strip() or m.group(3).strip() or             \
+           m.group(2) not in self.literalAliases:
+          projection.keepAll = True
+
+        return
+
+      token, path = splitToken(path)
+
+      if token == None:
+        projection.keepAll = True
+        return
+
+      # Text, or the whole element if it has none
+      if token == '_':
+        projection.keepAll = True
+        return
+
+      if token[0] == '@':
+        projection.attributes.add(token[1:])
+        return
+
+      if Xml2Cypher.strToVal(token) != None:
+        return
+
+      # Function results don't come from the document, their parameters do
+      m = Xml2Cypher.RE_Function.match(token)
+      if m:
+        if m.group(2):
+          for prop in Xml2Cypher.parseProperties(m.group(2), None, self.context):
+            self.visitPath(prop.path, projection)
+
+        return
+
+      if Xml2Cypher.RE_Index.match(token):
+        continue
+
+      projection = self.child(projection, token, False)
+
+
+#
+# Projection of the documents {x2c} may read, see ProjectionAnalysis
+def projection(x2c):
+  return ProjectionAnalysis(x2c).root
+
+#
+# Add elements and attributes of Projection {source} to {target}
+def mergeProjection(target, source):
+  target.uses |= source.uses
+
+  if target.keepAll:
+    return
+
+  if source.keepAll:
+    target.keepAll = True
+    return
+
+  target.attributes |= source.attributes
+
+  for (name, child) in source.children.items():
+    mergeProjection(target.child(name), child)
+
+#
+# Projection of the documents any of {projections} may read
+def union(projections):
+  result = InputHelper.Projection()
+
+  for p in projections:
+    mergeProjection(result, p)
+
+  return result
@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+
+# Variable and type references
+import re
+# Equivalence check
+import io
+
+# Schema internals
+import CypherWriter
+import IdHelper
+import SchemaAnalysis
+import Xml2Cypher
+
+
+#
+#
+# Constants
+CONST_RE_Variable_Ref = r'\$\{(\w+)\}'
+CONST_RE_Type_Ref = r'->\s*(\w+)'
+
+RE_Variable_Ref = re.compile(CONST_RE_Variable_Ref)
+RE_Type_Ref = re.compile(CONST_RE_Type_Ref)
+
+
+#
+#
+# Utils
+
+#
+# Whether {path} only reads the element, without variables nor functions
+def isPlainPath(path):
+  return '${' not in path and '#{' not in path
+
+#
+# Whether {prop} is converted to a primitive, without structures nor types
+def isPrimitive(prop, ctxt):
+  return prop.typeret in Xml2Cypher.CONST_Primitives and prop.typeret not in ctxt.types
+
+#
+# Value of literal path {prop}, as ( value, ), None if it isn't one. See
+# SchemaBaseValue.traversePath
+def literalValue(prop, ctxt):
+  if not prop.path or not isPlainPath(prop.path) or not isPrimitive(prop, ctxt):
+    return None
+
+  m = Xml2Cypher.RE_Token.match(prop.path)
+  if not m or m.end() != len(prop.path):
+    return None
+
+  v = Xml2Cypher.strToVal(m.group(1))
+  if v == None:
+    return None
+
+  try:
+    return ( ctxt.convert(v, prop.typeret), )
+  except BaseException:
+    return None
+
+#
+# Whether {prop} can be evaluated ahead of other properties: a conditional
+# property with a plain path, converted to a primitive, setting no variable
+def isGuard(prop, ctxt):
+  return                                                                      \
+    prop.isConditional and not prop.alias and bool(prop.path) and             \
+    isPlainPath(prop.path) and isPrimitive(prop, ctxt)
+
+#
+# Whether {prop} never raises nor rejects an element: generated ids,
+# literals, and optional properties with a plain path converted to a
+# primitive, whose errors are swallowed. See SchemaOptimizer.hoistGuards
+def isInfallible(prop, ctxt):
+  return                                                                      \
+    prop.isGeneratedId or prop.constant != None or                            \
+    (prop.isOptional and isPlainPath(prop.path) and isPrimitive(prop, ctxt))
+
+
+#
+#
+# Core
+
+#
+# Rewrites a parsed schema so that it emits the same statements faster.
+# Each pass returns how many items it changed.
+class SchemaOptimizer:
+
+  def __init__(self, x2c):
+    self.x2c = x2c
+    self.context = x2c.context
+
+  #
+  # Drop aliases no path, tag or function parameter reads, so their values
+  # aren't stored for every element
+  def dropUnusedAliases(self):
+    used = set()
+
+    for node in SchemaAnalysis.iterNodes(self.x2c):
+      used |= set(RE_Variable_Ref.findall(node.schema))
+
+    for types in self.context.types.values():
+      for t in types:
+        if not isinstance(t, Xml2Cypher.SchemaNode):
+          used |= set(RE_Variable_Ref.findall(t.path))
+
+    count = 0
+
+    for node in SchemaAnalysis.iterNodes(self.x2c):
+      for prop in SchemaAnalysis.nodeProperties(node):
+        if prop.alias and prop.alias not in used:
+          prop.alias = None
+          count += 1
+
+    return count
+
+  #
+  # Remove types and structures which can't be reached from the schema
+  def dropUnreachableTypes(self):
+    reached = set()
+    stack = list(self.x2c.root.children)
+
+    while stack:
+      item = stack.pop()
+
+      if isinstance(item, Xml2Cypher.SchemaNode):
+        stack += item.children
+
+      names = RE_Type_Ref.findall(
+        item.path + '->' + item.typeret if isinstance(item, Xml2Cypher.SchemaType)
+        else item.schema
+      )
+
+      for name in names:
+        if name in self.context.types and name not in reached:
+          reached.add(name)
+          stack += self.context.types[name]
+
+    unreachable = [ name for name in self.context.types if name not in reached ]
+
+    for name in unreachable:
+      del self.context.types[name]
+
+    return len(unreachable)
+
+  #
+  # Compute literal properties once, see SchemaProperty.constant
+  def foldConstants(self):
+    count = 0
+
+    for node in SchemaAnalysis.iterNodes(self.x2c):
+      for prop in SchemaAnalysis.nodeProperties(node):
+        value = literalValue(prop, self.context)
+
+        if value != None and prop.constant == None:
+          prop.constant = value
+          count += 1
+
+    return count
+
+  #
+  # Evaluate cheap conditional properties first, so rejected elements skip
+  # the other properties. Guards keep their relative order, and are only
+  # hoisted past properties which can neither reject an element nor raise,
+  # so the same elements are rejected and the same errors raised. Runs after
+  # foldConstants. See SchemaNode.apply_element
+  def hoistGuards(self):
+    count = 0
+
+    for node in SchemaAnalysis.iterNodes(self.x2c):
+      if not isinstance(node, Xml2Cypher.SchemaNode):
+        continue
+
+      guards = []
+      before = []
+      hoisted = False
+
+      for prop in node.properties:
+        if isGuard(prop, self.context):
+          # Ids consumed by the declaration order before rejecting
+          replay = [
+            p for p in before
+            if p.isGeneratedId and node.hashId == None
+          ]
+          guards.append(( prop, replay ))
+          hoisted = hoisted or len(before) > 0
+
+        elif isInfallible(prop, self.context):
+          before.append(prop)
+
+        else:
+          break
+
+      if hoisted:
+        node.guards = guards
+        count += len(guards)
+
+    return count
+
+  #
+  # Run all passes, return the number of changes per pass
+  def optimize(self):
+    return {
+      'unusedAliases': self.dropUnusedAliases(),
+      'unreachableTypes': self.dropUnreachableTypes(),
+      'foldedConstants': self.foldConstants(),
+      'hoistedGuards': self.hoistGuards()
+    }
+
+#
+# Optimize parsed schema {x2c} in place, see SchemaOptimizer
+def optimize(x2c):
+  return SchemaOptimizer(x2c).optimize()
+
+#
+# Apply schema file {schema} to XML file {filename}, as parsed and optimized,
+# and return the names of the outputs ('nodes', 'relationships') which
+# differ: empty if the optimizer preserved the output. Sequential ids are
+# reset before each run.
+def checkEquivalence(schema, filename, userFunctions = None, **applyOptions):
+  outputs = []
+
+  for optimized in ( False, True ):
+    x2c = Xml2Cypher.parse(schema, optimized)
+    nodeWriter = CypherWriter.CypherWriter(io.StringIO())
+    rsWriter = CypherWriter.CypherWriter(io.StringIO())
+
+    IdHelper.IdHelper.idDict.clear()
+    x2c.applyFile(filename, nodeWriter, rsWriter, userFunctions, **applyOptions)
+    nodeWriter.close()
+    rsWriter.close()
+
+    outputs.append(( nodeWriter.file.getvalue(), rsWriter.file.getvalue() ))
+
+  return [
+    name for (name, a, b) in zip([ 'nodes', 'relationships' ], outputs[0], outputs[1])
+    if a != b
+  ]
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+
+# Producer thread
+import threading
+import queue
+
+# Base writer
+import CypherWriter
+
+
+#
+#
+# Constants
+
+# Items produced ahead of the consumer, see `iterStatements`
+CONST_Queue_Size = 1000
+
+CONST_End = object()
+
+
+#
+# Raised in the producer thread once the consumer stopped iterating
+class Cancelled(Exception):
+  pass
+
+
+#
+# Writer passing each Cypher statement to {sink} (a callable taking a
+# string) as soon as it is complete, instead of writing it to a file.
+# Statements are not terminated by ";". Relationships are still rendered by
+# `flushRelationships`, i.e. on `close`. See `CypherWriter.CypherWriter` for
+# {dedup}, {order} and {compact}.
+class StatementWriter(CypherWriter.CypherWriter):
+
+  def __init__(self, sink, dedup = None, order = None, compact = False):
+    self.sink = sink
+    # Parts of the statement being written, see `write`
+    self.pending = []
+
+    # The writer is its own file object
+    super().__init__(self, dedup, order = order, compact = compact)
+
+  #
+  # Pass the previous statement to sink, start the next one. There are no
+  # transactions.
+  def updateTransaction(self, closing = False):
+    if self.pending:
+      self.sink("".join(self.pending))
+      self.pending = []
+
+    if not closing:
+      self.cmdCounter += 1
+
+  def write(self, buff):
+    self.pending.append(buff)
+
+  def close(self):
+    self.flushRelationships()
+    self.updateTransaction(True)
+
+#
+# Writer with the interface of CypherWriter.CypherWriter passing structured
+# items to {sink} as they are produced, nothing is formatted:
+# - ( 'node', label, properties, merge )
+# - ( 'relationship', nodeLbl1, nodeProps1, nodeLbl2, nodeProps2, rsName, rsProps )
+# Relationships are not deferred: they are passed right away, after both
+# their nodes.
+class RecordWriter:
+
+  def __init__(self, sink):
+    self.sink = sink
+    self.cmdCounter = 0
+    # Nothing is ever pending, see `Metrics.snapshot`
+    self.pendingCount = 0
+    self.duplicates = 0
+    # Optional progress reporting, see `Metrics.attach`
+    self.metrics = None
+
+  #
+  # Self-explanatory
+  def node(self, label, properties = None, merge = False):
+    if self.metrics:
+      self.metrics.node(label)
+
+    self.cmdCounter += 1
+    self.sink(( 'node', label, properties, merge ))
+
+  def relationship(self,
+                   nodeLbl1, nodeProps1,
+                   nodeLbl2, nodeProps2,
+                   rsName, rsProps = None):
+    if nodeProps1 == None or nodeProps2 == None:
+      raise ValueError('Cannot identify node stripped of properties')
+
+    if self.metrics:
+      self.metrics.relationship(rsName)
+
+    self.cmdCounter += 1
+    self.sink(( 'relationship', nodeLbl1, nodeProps1, nodeLbl2, nodeProps2, rsName, rsProps ))
+
+  #
+  # Nodes, then relationships of {record}, see `CypherWriter.record`
+  def record(self, record):
+    for (label, properties, merge) in record.nodes:
+      self.node(label, properties, merge)
+
+    for (src, tgt, rsName, rsProps) in record.relationships:
+      self.relationship(
+        record.nodes[src][0], record.nodes[src][1],
+        record.nodes[tgt][0], record.nodes[tgt][1],
+        rsName, rsProps
+      )
+
+  def flushRelationships(self):
+    pass
+
+  def close(self):
+    pass
+
+
+#
+#
+# Core
+
+#
+# Apply parsed schema {x2c} to {source} (a parsed document, or an XML file
+# name, see `X2CSchema.applyFile`) and yield what is written as it is
+# produced, without touching disk:
+# - ( 'node', statement ), ( 'relationship', statement ): Cypher statements
+#   of the node and relationship writers, see `StatementWriter`. Deferred
+#   relationships come last.
+# - with {records}, the items of `RecordWriter`.
+# The schema is applied in a thread, at most {queueSize} items ahead of the
+# consumer, which is blocked meanwhile. Errors are raised by the iterator.
+# Closing the iterator early stops the thread. {dedup}, {order} and
+# {compact} are options of the Cypher writers, see `StatementWriter`.
+# {applyOptions} are passed to `X2CSchema.apply` or `X2CSchema.applyFile`.
+# A schema must not be iterated over twice at the same time.
+def iterStatements(x2c, source, userFunctions = None, records = False,
+                   queueSize = CONST_Queue_Size, dedup = None, order = None,
+                   compact = False, **applyOptions):
+  items = queue.Queue(queueSize)
+  cancelled = threading.Event()
+
+  def put(item):
+    if cancelled.is_set():
+      raise Cancelled('Iteration stopped by the consumer')
+
+    items.put(item)
+
+  if records:
+    nodeWriter = rsWriter = RecordWriter(put)
+
+  else:
+    nodeWriter = StatementWriter(lambda s: put(( 'node', s )), compact = compact)
+    rsWriter = StatementWriter(lambda s: put(( 'relationship', s )), dedup, order, compact)
+
+  def produce():
+    try:
+      if isinstance(source, str):
+        x2c.applyFile(source, nodeWriter, rsWriter, userFunctions, **applyOptions)
+
+      else:
+        x2c.apply(source, nodeWriter, rsWriter, userFunctions, **applyOptions)
+
+      nodeWriter.close()
+      rsWriter.close()
+      put(CONST_End)
+
+    except BaseException as e:
+      if not cancelled.is_set():
+        items.put(e)
+
+  thread = threading.Thread(target = produce, daemon = True)
+  thread.start()
+
+  try:
+    while True:
+      item = items.get()
+
+      if item is CONST_End:
+        break
+
+      if isinstance(item, BaseException):
+        raise item
+
+      yield item
+
+  finally:
+    # Unblock the producer until it notices
+    cancelled.set()
+
+    while thread.is_alive():
+      try:
+        items.get(timeout = 0.1)
+      except queue.Empty:
+        pass
+
+    thread.join()
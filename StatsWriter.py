@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+
+#
+# Writer with the interface of CypherWriter.CypherWriter which only counts
+# what would be written: nodes per label, relationships per type, property
+# sizes and optional misses. Nothing is formatted nor written, see
+# `X2CSchema.dryRun`.
+class StatsWriter:
+
+  def __init__(self):
+    self.cmdCounter = 0
+    # Nothing is ever pending, see `Metrics.snapshot`
+    self.pendingCount = 0
+    self.duplicates = 0
+    # Optional progress reporting, see `Metrics.attach`
+    self.metrics = None
+
+    self.nodes = {}
+    self.relationships = {}
+
+    # {bucket}: count, values of size in [ bucket / 2, bucket [
+    self.propertySizes = {}
+    self.propertyCount = 0
+    self.propertyBytes = 0
+
+    # {Label.property}: count, see `miss`
+    self.optionalMisses = {}
+    self.conditionalMisses = {}
+
+  #
+  # Account for property values of {props}, sized as their string
+  # representation (escaping aside)
+  def countProperties(self, props):
+    if not props:
+      return
+
+    for v in props.values():
+      size = len(v) if type(v) == str else len(str(v))
+      bucket = 1 << size.bit_length()
+
+      self.propertySizes[bucket] = self.propertySizes.get(bucket, 0) + 1
+      self.propertyCount += 1
+      self.propertyBytes += size
+
+  #
+  # Self-explanatory
+  def node(self, label, properties = None, merge = False):
+    if self.metrics:
+      self.metrics.node(label)
+
+    self.cmdCounter += 1
+    self.nodes[label] = self.nodes.get(label, 0) + 1
+    self.countProperties(properties)
+
+  def relationship(self,
+                   nodeLbl1, nodeProps1,
+                   nodeLbl2, nodeProps2,
+                   rsName, rsProps = None):
+    if nodeProps1 == None or nodeProps2 == None:
+      raise ValueError('Cannot identify node stripped of properties')
+
+    if self.metrics:
+      self.metrics.relationship(rsName)
+
+    self.cmdCounter += 1
+    self.relationships[rsName] = self.relationships.get(rsName, 0) + 1
+    self.countProperties(rsProps)
+
+  #
+  # Nodes and relationships of a record, see `CypherWriter.record`
+  def record(self, record):
+    for (label, properties, merge) in record.nodes:
+      self.node(label, properties, merge)
+
+    for (_, _, rsName, rsProps) in record.relationships:
+      if self.metrics:
+        self.metrics.relationship(rsName)
+
+      self.relationships[rsName] = self.relationships.get(rsName, 0) + 1
+      self.countProperties(rsProps)
+
+  #
+  # Property {prop} of {parentName} wasn't found: it was either optional, or
+  # conditional and its node was skipped
+  def miss(self, parentName, prop, conditional = False):
+    key = (parentName + '.' if parentName else '') + (prop.typename or prop.path)
+    misses = self.conditionalMisses if conditional else self.optionalMisses
+
+    misses[key] = misses.get(key, 0) + 1
+
+  #
+  # Structured summary of the run
+  def report(self):
+    return {
+      'nodes': dict(self.nodes),
+      'relationships': dict(self.relationships),
+      'nodesTotal': sum(self.nodes.values()),
+      'relationshipsTotal': sum(self.relationships.values()),
+      'properties': self.propertyCount,
+      'propertyBytes': self.propertyBytes,
+      'propertySizes': dict(sorted(self.propertySizes.items())),
+      'optionalMisses': dict(self.optionalMisses),
+      'conditionalMisses': dict(self.conditionalMisses)
+    }
+
+  #
+  # Writer interface, nothing to do
+  def flushRelationships(self):
+    pass
+
+  def close(self):
+    pass
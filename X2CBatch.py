@@ -0,0 +1,303 @@
+#!/usr/bin/env python
+
+#
+# Apply one parsed schema to many XML files, concurrently.
+#
+# Usage: X2CBatch.py [options] schema source [source ...]
+#
+# Same options as X2CCommand, with as many workers as CPUs by default.
+
+# Sources listing
+import glob
+import os
+import sys
+# User functions module
+import importlib
+import importlib.util
+# Worker processes
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+# Intermediate node files
+import io
+import tempfile
+
+# X2C
+import CypherWriter
+import IdHelper
+import PartitionedWriter
+import Xml2Cypher
+
+
+#
+#
+# Constants
+CONST_Id_Block_Size = 1024
+CONST_Source_Pattern = '*.xml*'
+CONST_Nodes_Filename = 'nodes.cql'
+CONST_Relationships_Filename = 'relationships.cql'
+# Stripped from input file names, in this order, see `outputName`
+CONST_Input_Suffixes = [ [ '.gz', '.bz2', '.xz' ], [ '.xml' ] ]
+
+
+#
+#
+# Utils
+
+#
+# Name of the per-file outputs of input {filename}: its base name without
+# compression and .xml suffixes, e.g. feed_v3.4 for feed_v3.4.xml.gz
+def outputName(filename):
+  name = os.path.basename(filename)
+
+  for suffixes in CONST_Input_Suffixes:
+    for suffix in suffixes:
+      if name.lower().endswith(suffix) and len(name) > len(suffix):
+        name = name[:-len(suffix)]
+        break
+
+  return name
+
+#
+# List files matched by {sources}: glob patterns, directories or file names
+def listSources(sources):
+  if isinstance(sources, str):
+    sources = [ sources ]
+
+  files = []
+
+  for source in sources:
+    if os.path.isdir(source):
+      files += sorted(glob.glob(os.path.join(source, CONST_Source_Pattern)))
+
+    else:
+      files += sorted(glob.glob(source)) or [ source ]
+
+  return files
+
+#
+# Load user functions from module {name} (module name or file path). Either
+# its `userFunctions` dictionary, or all of its public functions.
+def loadFunctions(name):
+  if not name:
+    return None
+
+  if name.endswith('.py'):
+    spec = importlib.util.spec_from_file_location(
+      os.path.splitext(os.path.basename(name))[0], name
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+  else:
+    module = importlib.import_module(name)
+
+  if hasattr(module, 'userFunctions'):
+    return module.userFunctions
+
+  return {
+    k: v for (k, v) in vars(module).items()
+    if callable(v) and not k.startswith('_') and                            \
+       getattr(v, '__module__', None) == module.__name__
+  }
+
+
+#
+#
+# Workers
+
+# Per-process state, see `initWorker`
+workerState = {}
+
+def initWorker(schema, userFunctions, applyOptions, counters = None, lock = None, blockSize = CONST_Id_Block_Size):
+  workerState['schema'] = schema
+  workerState['userFunctions'] = userFunctions
+  workerState['applyOptions'] = applyOptions
+
+  # Ids are allocated in blocks from counters shared with other workers
+  if counters != None:
+    Xml2Cypher.ids = IdHelper.BlockIdHelper(counters, lock, blockSize)
+
+#
+# Relationship writer for {rsFilename}, split in {partitions} concurrent
+# files if specified, see `PartitionedWriter.PartitionedWriter`
+def openRelationshipWriter(rsFilename, dedup = None, transactionSize = None, order = None,
+                           compact = False, partitions = None):
+  if partitions:
+    return PartitionedWriter.PartitionedWriter(
+      rsFilename, partitions, dedup = dedup, transactionSize = transactionSize,
+      order = order, compact = compact
+    )
+
+  return CypherWriter.CypherWriter(
+    rsFilename, dedup, transactionSize, order = order, compact = compact
+  )
+
+#
+# Convert {filename} into per-file outputs {nodeFilename}, {rsFilename}
+def convertFile(filename, nodeFilename, rsFilename, dedup = None, transactionSize = None,
+                order = None, compact = False, partitions = None):
+  nodeWriter = CypherWriter.CypherWriter(
+    nodeFilename, transactionSize = transactionSize, compact = compact
+  )
+  rsWriter = openRelationshipWriter(
+    rsFilename, dedup, transactionSize, order, compact, partitions
+  )
+
+  workerState['schema'].applyFile(
+    filename, nodeWriter, rsWriter,
+    workerState['userFunctions'], **workerState['applyOptions']
+  )
+
+  nodeWriter.close()
+  rsWriter.close()
+
+  return filename
+
+#
+# Convert {filename}, writing nodes to {nodeFilename} and returning pending
+# relationships to be merged by the caller. Endpoints are formatted as by
+# the caller's writer, see {compact}.
+def convertFileMerged(filename, nodeFilename, compact = False):
+  nodeWriter = CypherWriter.CypherWriter(nodeFilename, compact = compact)
+  rsWriter = CypherWriter.CypherWriter(io.StringIO(), compact = compact)
+
+  workerState['schema'].applyFile(
+    filename, nodeWriter, rsWriter,
+    workerState['userFunctions'], **workerState['applyOptions']
+  )
+
+  nodeWriter.file.close()
+
+  return ( nodeWriter.cmdCounter, rsWriter.exportRelationships() )
+
+
+#
+#
+# Core
+
+#
+# Apply {schema} to every file in {sources} (see `listSources`), using
+# {workers} processes (defaults to CPU count).
+# With {merge}, nodes of all files are written to {outputDir}/nodes.cql, in
+# file order, and relationships of all files are flushed together to
+# {outputDir}/relationships.cql. Otherwise each file gets its own
+# {name}-nodes.cql and {name}-relationships.cql, see `outputName`.
+# Ids are unique across files: each worker allocates them in blocks of
+# {blockSize} from shared counters. {applyOptions} are passed to
+# X2CSchema.apply. Returns the list of output files.
+# With {dedup} ('exact' or 'bloom'), duplicate relationships are written once,
+# across all files when merged. With {transactionSize}, output statements are
+# wrapped in transactions of that size. {order} is the order relationships
+# are written in, {compact} leaves out optional whitespace. See
+# `CypherWriter.CypherWriter`. With {partitions}, relationships are split in
+# files which can be loaded concurrently, described by
+# relationships.json (per file: {name}-relationships.json). See
+# `PartitionedWriter.PartitionedWriter`
+def convertFiles(schema, sources, outputDir, userFunctions = None, workers = None,
+                 merge = True, blockSize = CONST_Id_Block_Size, dedup = None,
+                 transactionSize = None, order = None, compact = False, partitions = None,
+                 **applyOptions):
+  files = listSources(sources)
+  os.makedirs(outputDir, exist_ok = True)
+
+  # Writers held by a previous run can't be sent to workers
+  schema.context.nodeWriter = schema.context.rsWriter = None
+
+  with multiprocessing.Manager() as manager:
+    initArgs = (
+      schema, userFunctions, applyOptions,
+      manager.dict(), manager.Lock(), blockSize
+    )
+
+    with ProcessPoolExecutor(workers, initializer = initWorker, initargs = initArgs) as executor:
+      if not merge:
+        return convertPerFile(
+          executor, files, outputDir, dedup, transactionSize, order, compact, partitions
+        )
+
+      return convertMerged(
+        executor, files, outputDir, dedup, transactionSize, order, compact, partitions
+      )
+
+def convertPerFile(executor, files, outputDir, dedup = None, transactionSize = None,
+                   order = None, compact = False, partitions = None):
+  outputs = []
+  futures = []
+
+  # Two inputs writing the same outputs would overwrite each other
+  names = {}
+  for filename in files:
+    name = outputName(filename)
+
+    if name in names:
+      raise ValueError(
+        'Inputs %s and %s would write the same outputs %s-*' % (names[name], filename, name)
+      )
+
+    names[name] = filename
+
+  for filename in files:
+    name = outputName(filename)
+    nodeFilename = os.path.join(outputDir, name + '-' + CONST_Nodes_Filename)
+    rsFilename = os.path.join(outputDir, name + '-' + CONST_Relationships_Filename)
+
+    futures.append(executor.submit(
+      convertFile, filename, nodeFilename, rsFilename, dedup, transactionSize,
+      order, compact, partitions
+    ))
+    outputs += [ nodeFilename, rsFilename ]
+
+    if partitions:
+      outputs.append(os.path.splitext(rsFilename)[0] + '.json')
+
+  for future in futures:
+    future.result()
+
+  return outputs
+
+def convertMerged(executor, files, outputDir, dedup = None, transactionSize = None,
+                  order = None, compact = False, partitions = None):
+  nodeFilename = os.path.join(outputDir, CONST_Nodes_Filename)
+  rsFilename = os.path.join(outputDir, CONST_Relationships_Filename)
+
+  nodeWriter = CypherWriter.CypherWriter(
+    nodeFilename, transactionSize = transactionSize, compact = compact
+  )
+  rsWriter = openRelationshipWriter(
+    rsFilename, dedup, transactionSize, order, compact, partitions
+  )
+
+  with tempfile.TemporaryDirectory(dir = outputDir) as tmpDir:
+    chunks = [ os.path.join(tmpDir, '%d.cql' % i) for i in range(len(files)) ]
+    futures = [
+      executor.submit(convertFileMerged, filename, chunk, compact)
+      for (filename, chunk) in zip(files, chunks)
+    ]
+
+    # Merged in file order, regardless of completion order
+    for (future, chunk) in zip(futures, chunks):
+      count, relationships = future.result()
+
+      with open(chunk, encoding="utf8") as fd:
+        nodeWriter.append(fd, count)
+
+      rsWriter.importRelationships(relationships)
+
+  nodeWriter.close()
+  rsWriter.close()
+
+  if partitions:
+    return [ nodeFilename ] + rsWriter.outputs()
+
+  return [ nodeFilename, rsFilename ]
+
+#
+# Command line: `X2CCommand.main` with all CPUs by default
+def main(argv = None):
+  # Command line (imports this module)
+  import X2CCommand
+
+  return X2CCommand.main([ '-j', '0' ] + (sys.argv[1:] if argv == None else argv))
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+
+#
+# Apply an X2C schema to XML files from the command line.
+#
+# Usage: x2c [-h] [-o OUTPUT] [-f FUNCTIONS] [--input {stream,memory}]
+#            [--no-projection] [--chunk-size BYTES] [--writer {cypher,jsonl,stats,bolt}]
+#            [--transaction-size N] [--batch-size N] [--buffer-size BYTES]
+#            [--dedup {exact,bloom}] [--order {key,source,target}] [--compact]
+#            [--colocate] [--unchecked] [-j WORKERS]
+#            [--metrics FILE] [--metrics-interval SECONDS] [--profile FILE]
+#            [--optimize] [--uri URI] [--user USER] [--database NAME]
+#            [--concurrency N] [--partitions N] [--per-file]
+#            schema source [source ...]
+#
+# Also available as `python -m Xml2Cypher`, or `python X2CCommand.py`.
+
+# Command line
+import argparse
+# Output files
+import json
+import os
+import sys
+# Profiling
+import cProfile
+
+# X2C
+import BoltWriter
+import CypherWriter
+import InputHelper
+import JsonLinesWriter
+import Metrics
+import PartitionedWriter
+import StatsWriter
+import X2CBatch
+import Xml2Cypher
+
+
+#
+#
+# Constants
+CONST_Writers = [ 'cypher', 'jsonl', 'stats', 'bolt' ]
+CONST_Json_Lines_Filename = 'graph.jsonl'
+CONST_Stats_Filename = 'stats.json'
+
+
+#
+#
+# Utils
+
+def parseArgs(argv = None):
+  parser = argparse.ArgumentParser(
+    prog = 'x2c', description = 'Apply an X2C schema to XML files.'
+  )
+  parser.add_argument('schema', help = 'schema file')
+  parser.add_argument('sources', nargs = '+', help = 'XML files (optionally compressed), directories or glob patterns')
+  parser.add_argument('-o', '--output', default = '.', help = 'output directory')
+  parser.add_argument('-f', '--functions', help = 'user functions module (name or .py path)')
+
+  group = parser.add_argument_group('input')
+  group.add_argument('--input', choices = [ 'stream', 'memory' ], default = 'stream',
+                     help = 'parse files in streaming chunks, or read them whole in memory first (default: stream)')
+  group.add_argument('--no-projection', action = 'store_true',
+                     help = 'keep elements the schema never reads (streaming input)')
+  group.add_argument('--chunk-size', type = int, default = InputHelper.CONST_Chunk_Size,
+                     help = 'bytes parsed at once (default: %(default)s)')
+
+  group = parser.add_argument_group('output')
+  group.add_argument('--writer', choices = CONST_Writers, default = 'cypher',
+                     help = 'cypher-shell scripts, APOC JSON lines, statistics only, or '
+                            'statements sent to Neo4j (default: cypher)')
+  group.add_argument('--transaction-size', type = int,
+                     help = 'wrap Cypher statements in :begin/:commit blocks of this size, '
+                            'statements per transaction with the bolt writer')
+  group.add_argument('--batch-size', type = int,
+                     help = 'JSON lines written per label run (default: %d)' % JsonLinesWriter.CONST_Batch_Size)
+  group.add_argument('--buffer-size', type = int, default = -1,
+                     help = 'output file buffer size in bytes (default: system)')
+  group.add_argument('--dedup', choices = [ 'exact', 'bloom' ],
+                     help = 'write duplicate relationships once')
+  group.add_argument('--order', choices = CypherWriter.CONST_Orders,
+                     help = 'write relationships by key, or clustered by source or target node (default: key)')
+  group.add_argument('--compact', action = 'store_true',
+                     help = 'write Cypher statements without optional whitespace, with short variable names')
+  group.add_argument('--partitions', type = int,
+                     help = 'split relationships in files loadable by this many concurrent '
+                            'sessions without locking the same nodes, see relationships.json')
+  group.add_argument('--colocate', action = 'store_true',
+                     help = 'write each record with its relationships in one statement')
+  group.add_argument('--unchecked', action = 'store_true',
+                     help = 'skip primitive type checks')
+
+  group = parser.add_argument_group('execution')
+  group.add_argument('-j', '--workers', type = int, default = 1,
+                     help = 'worker processes, 0 for CPU count (default: 1)')
+  group.add_argument('--per-file', action = 'store_true',
+                     help = 'write one node and relationship file per input, see X2CBatch')
+  group.add_argument('--metrics', help = 'append progress snapshots to this JSON lines file')
+  group.add_argument('--metrics-interval', type = float, default = 5.0,
+                     help = 'seconds between progress snapshots (default: %(default)s)')
+  group.add_argument('--profile', help = 'write cProfile statistics to this file')
+  group.add_argument('--optimize', action = 'store_true',
+                     help = 'optimize the schema before applying it, see SchemaOptimizer')
+
+  group = parser.add_argument_group('bolt writer', 'the password is read from NEO4J_PASSWORD')
+  group.add_argument('--uri', default = 'neo4j://localhost:7687',
+                     help = 'Neo4j server (default: %(default)s)')
+  group.add_argument('--user', default = 'neo4j', help = 'user name (default: %(default)s)')
+  group.add_argument('--database', help = 'database name (default: the server\'s)')
+  group.add_argument('--concurrency', type = int, default = BoltWriter.CONST_Concurrency,
+                     help = 'transactions sent at once (default: %(default)s)')
+
+  args = parser.parse_args(argv)
+
+  # Converted by X2CBatch
+  if args.workers != 1 or args.per_file:
+    if args.writer != 'cypher':
+      parser.error('--workers and --per-file require the cypher writer')
+
+    if args.input != 'stream':
+      parser.error('--workers and --per-file require streaming input')
+
+    # Workers write their own files, and report to nothing
+    if args.metrics:
+      parser.error('--metrics requires a single worker, without --per-file')
+
+    if args.buffer_size != -1:
+      parser.error('--buffer-size requires a single worker, without --per-file')
+
+  if args.batch_size != None and args.writer != 'jsonl':
+    parser.error('--batch-size requires the jsonl writer')
+
+  if args.partitions and args.writer != 'cypher':
+    parser.error('--partitions requires the cypher writer')
+
+  return args
+
+#
+# Node and relationship writers for {args}, and the files they write
+def openWriters(args):
+  if args.writer == 'jsonl':
+    filename = os.path.join(args.output, CONST_Json_Lines_Filename)
+    writer = JsonLinesWriter.JsonLinesWriter(
+      filename, args.batch_size or JsonLinesWriter.CONST_Batch_Size, args.dedup,
+      args.buffer_size
+    )
+
+    return ( writer, writer, [ filename ] )
+
+  if args.writer == 'stats':
+    writer = StatsWriter.StatsWriter()
+    return ( writer, writer, [ os.path.join(args.output, CONST_Stats_Filename) ] )
+
+  if args.writer == 'bolt':
+    writer = BoltWriter.BoltWriter(
+      args.uri, ( args.user, os.environ.get('NEO4J_PASSWORD', '') ), args.database,
+      args.transaction_size, args.concurrency,
+      dedup = args.dedup, order = args.order, compact = args.compact
+    )
+    return ( writer, writer, [ args.uri ] )
+
+  nodeFilename = os.path.join(args.output, X2CBatch.CONST_Nodes_Filename)
+  rsFilename = os.path.join(args.output, X2CBatch.CONST_Relationships_Filename)
+
+  nodeWriter = CypherWriter.CypherWriter(
+    nodeFilename, None, args.transaction_size, args.buffer_size, compact = args.compact
+  )
+
+  if args.partitions:
+    rsWriter = PartitionedWriter.PartitionedWriter(
+      rsFilename, args.partitions, dedup = args.dedup,
+      transactionSize = args.transaction_size, bufferSize = args.buffer_size,
+      order = args.order, compact = args.compact
+    )
+    # Partition files are only known once closed, see `convert`
+    return ( nodeWriter, rsWriter, [ nodeFilename ] )
+
+  return (
+    nodeWriter,
+    CypherWriter.CypherWriter(
+      rsFilename, args.dedup, args.transaction_size, args.buffer_size, args.order,
+      args.compact
+    ),
+    [ nodeFilename, rsFilename ]
+  )
+
+
+#
+#
+# Core
+
+#
+# Apply schema to all sources in this process. Returns the output files.
+def convert(args, schema, files, userFunctions):
+  nodeWriter, rsWriter, outputs = openWriters(args)
+
+  metrics = None
+  if args.metrics:
+    metrics = Metrics.Metrics(
+      interval = args.metrics_interval,
+      exporters = [ Metrics.JsonLinesExporter(args.metrics) ]
+    )
+
+  applyOptions = {
+    'uncheckedTypes': args.unchecked,
+    'metrics': metrics,
+    'colocate': args.colocate
+  }
+
+  for filename in files:
+    if args.input == 'memory':
+      # Xml : dictionary mapping
+      import xmltodict
+
+      with InputHelper.InputFile(filename, metrics) as fd:
+        o = xmltodict.parse(fd.read())
+
+      schema.apply(o, nodeWriter, rsWriter, userFunctions, **applyOptions)
+
+    else:
+      schema.applyFile(
+        filename, nodeWriter, rsWriter, userFunctions,
+        project = not args.no_projection, chunkSize = args.chunk_size,
+        **applyOptions
+      )
+
+  nodeWriter.close()
+  if rsWriter is not nodeWriter:
+    rsWriter.close()
+
+  if isinstance(rsWriter, PartitionedWriter.PartitionedWriter):
+    outputs += rsWriter.outputs()
+
+  if metrics:
+    metrics.close()
+
+  if args.writer == 'stats':
+    with open(outputs[0], "w", encoding="utf8") as fd:
+      json.dump(nodeWriter.report(), fd, indent = 2)
+
+  return outputs
+
+#
+# Apply schema to sources in worker processes, see `X2CBatch.convertFiles`
+def convertParallel(args, schema, files, userFunctions):
+  return X2CBatch.convertFiles(
+    schema, files, args.output, userFunctions, args.workers or None,
+    not args.per_file, dedup = args.dedup, transactionSize = args.transaction_size, order = args.order,
+    compact = args.compact, partitions = args.partitions,
+    uncheckedTypes = args.unchecked, colocate = args.colocate,
+    project = not args.no_projection, chunkSize = args.chunk_size
+  )
+
+def main(argv = None):
+  args = parseArgs(argv)
+
+  schema = Xml2Cypher.parse(args.schema, args.optimize)
+  userFunctions = X2CBatch.loadFunctions(args.functions)
+  files = X2CBatch.listSources(args.sources)
+
+  os.makedirs(args.output, exist_ok = True)
+
+  run = convertParallel if args.workers != 1 or args.per_file else convert
+
+  if args.profile:
+    profiler = cProfile.Profile()
+    outputs = profiler.runcall(run, args, schema, files, userFunctions)
+    profiler.dump_stats(args.profile)
+
+  else:
+    outputs = run(args, schema, files, userFunctions)
+
+  for filename in outputs:
+    print(filename)
+
+  return 0
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -41,12 +41,19 @@ from collections import OrderedDict
 import CypherWriter
 # Id generator
 import IdHelper
+# XML files input
+import InputHelper
+# Dry runs
+import StatsWriter
+# Statements iterator
+import StatementWriter
 
 
 #
 #
 # Utils
 ids = IdHelper.IdHelper()
+hashIds = IdHelper.HashIdHelper()
   
 #
 # Select error type to be thrown based on several rules
@@ -150,6 +157,22 @@ def expandVar(s, ctxt, o, shouldRaise = True):
     
   return s
 
+#
+# Function call leading {path}, as ( token, funcName, propsStr ), if any.
+# Tokens are split as in SchemaBaseValue.traversePath
+def leadingFunction(path):
+  if not path or '${' in path:
+    return None
+  
+  m = RE_Token_Split.match(path) or RE_Token.match(path)
+  if not m:
+    return None
+  
+  token = m.group(1)
+  m = RE_Function.match(token)
+  
+  return ( token, ) + m.groups() if m else None
+
 #
 # Parse property list {properties} into {schemaProperties}
 def parseProperties(properties, parentName, ctxt):
@@ -174,6 +197,139 @@ def parseProperties(properties, parentName, ctxt):
   
   return schemaProperties
 
+#
+# Convert {o} to a hashable equivalent, used as cache key
+def freeze(o):
+  if isinstance(o, dict):
+    return tuple([ (k, freeze(v)) for (k, v) in o.items() ])
+  
+  if isinstance(o, (list, tuple)):
+    return tuple([ freeze(v) for v in o ])
+  
+  return o
+
+#
+# User function without side effects, whose results are cached in a bounded
+# LRU keyed on its parameters. Cached results are shared between calls, and
+# should not be mutated. See `pure`
+class PureFunction:
+  
+  def __init__(self, func, maxSize):
+    self.func = func
+    self.maxSize = maxSize
+    self.cache = OrderedDict()
+    self.hits = 0
+    self.misses = 0
+  
+  def __call__(self, params):
+    key = freeze(params)
+    
+    try:
+      ret = self.cache[key]
+      
+    # Unhashable parameters are never cached
+    except TypeError:
+      self.misses += 1
+      return self.func(params)
+    
+    except KeyError:
+      self.misses += 1
+      ret = self.cache[key] = self.func(params)
+      
+      if len(self.cache) > self.maxSize:
+        self.cache.popitem(last = False)
+      
+      return ret
+    
+    self.hits += 1
+    self.cache.move_to_end(key)
+    
+    return ret
+  
+  def cacheInfo(self):
+    return {
+      'hits': self.hits,
+      'misses': self.misses,
+      'size': len(self.cache),
+      'maxSize': self.maxSize
+    }
+  
+  def clear(self):
+    self.cache.clear()
+    self.hits = 0
+    self.misses = 0
+
+#
+# User function processing a list of parameter dictionaries at once, and
+# returning the list of results in the same order. Collection nodes gather
+# parameters for all their elements (or chunks of {size}), see
+# SchemaNode.prefetch. Calls made outside of a collection are wrapped in a
+# list of one.
+class BatchFunction:
+  
+  def __init__(self, func, size):
+    self.func = func
+    self.size = size
+  
+  def __call__(self, params):
+    return self.applyAll([ params ])[0]
+  
+  def applyAll(self, paramsList):
+    results = []
+    size = self.size or len(paramsList)
+    
+    for i in range(0, len(paramsList), size):
+      chunk = paramsList[i:i + size]
+      ret = list(self.func(chunk))
+      
+      if len(ret) != len(chunk):
+        raise ValueError(
+          'Batch function returned {} results for {} parameters'.format(len(ret), len(chunk))
+        )
+      
+      results.extend(ret)
+    
+    return results
+
+#
+# Register {func} as a batch function in the userFunctions dictionary, e.g.
+# { 'parseTags': batch(parseAllTags, size = 1000) }. Can also be used as a
+# decorator.
+def batch(func = None, size = None):
+  if func == None:
+    return lambda f: BatchFunction(f, size)
+  
+  return BatchFunction(func, size)
+
+#
+# Register {func} as pure in the userFunctions dictionary, e.g.
+# { 'parseTags': pure(parseTags) }. Can also be used as a decorator.
+def pure(func = None, maxSize = None):
+  maxSize = maxSize or CONST_Pure_Cache_Size
+  
+  if func == None:
+    return lambda f: PureFunction(f, maxSize)
+  
+  return PureFunction(func, maxSize)
+
+#
+# Evaluate parameters {propsStr} of a function call on {o}. Returns None if
+# a conditional parameter is not met
+def functionParams(propsStr, o, ctxt):
+  scopedCtxt = ctxt.newContext()
+  props = {}
+  
+  for prop in parseProperties(propsStr, None, scopedCtxt):
+    ret = prop.apply(o, scopedCtxt)
+    
+    if not ret[1]:
+      return None
+    
+    if prop.typename:
+      props[prop.typename] = ret[0]
+  
+  return props
+
 #
 # Fixes xmlToDict inconsistent behavior with dictionaries
 def normalizeDict(object):
@@ -205,7 +361,19 @@ CONST_RE_Comment = r'\s*(#.*)?'
 CONST_RE_Index = r'\[(\d+)\](\*)?'
 CONST_RE_Literal = '".*"'
 # Note: @CREATE is assumed by default, but has been added for consistency
-CONST_RE_Options = '(@MERGE|@CREATE|@ADDMOREOPTIONS)*'
+CONST_RE_Options = r'((?:@MERGE|@CREATE|@WHEN\(.*?\)|@HASHID(?:\(.*?\))?|@ADDMOREOPTIONS)*)'
+# Matches @HASHID or @HASHID({property list}) in an option list
+CONST_RE_Hash_Id_Option = r'@HASHID(?:\((.*?)\))?'
+# Matches each @WHEN({discriminator}) in an option list
+CONST_RE_When_Option = r'@WHEN\((.*?)\)'
+# Matches {element}, {element}="literal", @{attribute}, @{attribute}="literal" or "literal"
+CONST_RE_When = r'\s*(?:(@\w+|\w+)\s*(?:=\s*("[^"]*"))?|("[^"]*"))\s*'
+# Dispatch decisions cached per structure, see SchemaDispatcher
+CONST_Dispatch_Memo_Size = 4096
+# Results cached per pure user function, see PureFunction
+CONST_Pure_Cache_Size = 65536
+# Nodes per single-pass record statement, see Context.emitNode
+CONST_Record_Max_Nodes = 1000
 # Matches identifiers, e.g. Person, Authenticated${Role}, string, ...
 CONST_RE_Id_Req = CONST_RE_Ws + r'(\w+|\$\{\w+\})' + CONST_RE_Ws
 CONST_RE_Id_Opt = CONST_RE_Ws + r'(\w+|\$\{\w+\})?' + CONST_RE_Ws
@@ -283,6 +451,9 @@ RE_Function = compile(CONST_RE_Function)
 RE_Type = compile(CONST_RE_Type)
 RE_Node = compile(CONST_RE_Node)
 RE_Relationship = compile(CONST_RE_Relationship)
+RE_When = compile(CONST_RE_When)
+RE_When_Option = re.compile(CONST_RE_When_Option)
+RE_Hash_Id_Option = re.compile(CONST_RE_Hash_Id_Option)
 
 #
 #
@@ -291,7 +462,7 @@ RE_Relationship = compile(CONST_RE_Relationship)
 # Holds scope-specific context data
 class Context:
   
-  def __init__(self, vars, types, functions, nodeWriter, rsWriter, uncheckedTypes):
+  def __init__(self, vars, types, functions, nodeWriter, rsWriter, uncheckedTypes, metrics = None, batchResults = None):
     # Variables, either automatic or schema-defined
     self.variables = vars
     # Loaded types, should remain the same in every scope
@@ -304,6 +475,20 @@ class Context:
     self.rsWriter = rsWriter
     
     self.uncheckedTypes = uncheckedTypes
+    
+    # Optional progress reporting, see `Metrics.Metrics`
+    self.metrics = metrics
+    
+    # Batch function results, keyed by ( token, id(element) ). Shared by all
+    # scopes, see SchemaNode.prefetch
+    self.batchResults = batchResults if batchResults != None else {}
+    
+    # Single-pass emission of records, see SchemaNode.apply_element
+    self.colocate = False
+    self.record = None
+    
+    # Optional misses are reported to dry runs, see X2CSchema.dryRun
+    self.stats = None
   
   def isUnchecked(self):
     return self.uncheckedTypes
@@ -322,6 +507,22 @@ class Context:
     l = self.types[key] if key in self.types else None
     
     self.types[key] = l + [ t ] if l else [ t ]
+    
+    # Structure overloads declaring discriminators are dispatched by the first
+    # one, see SchemaNode.dispatch. Its tag, collection and optional flags
+    # thus apply to all of them.
+    nodes = [ n for n in self.types[key] if isinstance(n, SchemaNode) ]
+    
+    if any([ n.discriminators for n in nodes ]):
+      for n in nodes[1:]:
+        if ( n.tag, n.isCollection, n.isOptional ) !=                         \
+           ( nodes[0].tag, nodes[0].isCollection, nodes[0].isOptional ):
+          raise SyntaxError(
+            'Overloads with @WHEN must have the same tag, [] and ?: ' +       \
+            str(nodes[0]) + ' and ' + str(n)
+          )
+      
+      nodes[0].dispatcher = SchemaDispatcher(nodes)
   
   #
   # Self-explanatory
@@ -342,6 +543,10 @@ class Context:
     l = self.types.get(targetType, None)
     count = 0
     if l:
+      # One overload is selected per element
+      if isinstance(l[0], SchemaNode) and l[0].dispatcher:
+        return l[0].apply(o, self)
+      
       for t in l:
         count += 1
         ret = t.apply(o, self)
@@ -351,15 +556,41 @@ class Context:
     f = CONST_Primitives.get(targetType, None)
     return f(o) if f else None
   
-  def newContext(self):
-    return Context(
-      copy.copy(self.variables),
-      self.types,
-      self.functions,
-      self.nodeWriter,
-      self.rsWriter,
-      self.isUnchecked
+  #
+  # Write node, or add it to the current record
+  def emitNode(self, label, properties, merge):
+    if self.record == None:
+      self.nodeWriter.node(label, properties, merge)
+      return
+    
+    # Bound record size, later relationships to these nodes are deferred
+    if len(self.record.nodes) >= CONST_Record_Max_Nodes:
+      self.nodeWriter.record(self.record)
+      self.record.clear()
+    
+    self.record.node(label, properties, merge)
+  
+  #
+  # Add relationship to the current record if both its nodes belong to it,
+  # otherwise defer it to the relationship writer
+  def emitRelationship(self, nodeLbl1, nodeProps1, nodeLbl2, nodeProps2, rsName, rsProps):
+    if self.record != None:
+      src = self.record.find(nodeLbl1, nodeProps1)
+      tgt = self.record.find(nodeLbl2, nodeProps2)
+      
+      if src != None and tgt != None:
+        self.record.relationship(src, tgt, rsName, rsProps)
+        return
+    
+    self.rsWriter.relationship(
+      nodeLbl1, nodeProps1, nodeLbl2, nodeProps2, rsName, rsProps
     )
+  
+  def newContext(self):
+    ctxt = copy.copy(self)
+    ctxt.variables = copy.copy(self.variables)
+    
+    return ctxt
 
 class SchemaBaseValue:
   path = None
@@ -446,19 +677,19 @@ class SchemaBaseValue:
     m = RE_Function.match(token)
     if m:
       funcName, propsStr = m.groups()
-      scopedCtxt = ctxt.newContext()
-      props = {}
+      key = ( token, id(o) )
       
-      for prop in parseProperties(propsStr, None, scopedCtxt):
-        ret = prop.apply(o, scopedCtxt)
-        
-        if not ret[1]:
-          return None
-        
-        if prop.typename:
-          props[prop.typename] = ret[0]
+      # Result already computed by a batch call
+      if key in ctxt.batchResults:
+        o = ctxt.batchResults.pop(key)
+        return self.traversePath(path, o, ctxt)
+      
+      props = functionParams(propsStr, o, ctxt)
       
-      o = scopedCtxt.applyFunction(funcName, props)
+      if props == None:
+        return None
+      
+      o = ctxt.applyFunction(funcName, props)
       return self.traversePath(path, o, ctxt)
     
     # Is it an index ?
@@ -545,18 +776,33 @@ class SchemaProperty(SchemaType):
     # id types have a default alias name
     elif not self.alias and self.getRealType(ctxt) == PrimitiveTypes.id.name and parentName:
       self.alias = parentName + 'Id'
+    
+    # Auto-generated id, see SchemaNode.hashId
+    self.isGeneratedId =                                                      \
+      not any(self.path) and parentName != None and                           \
+      self.getRealType(ctxt) == PrimitiveTypes.id.name
+    
+    # ( value, ) of literal paths, see SchemaOptimizer.foldConstants
+    self.constant = None
   
   #
   # Apply defined schema to node object
-  def apply(self, o, ctxt):
+  # Generated ids are derived from {hashKey} if specified, see HashIdHelper
+  def apply(self, o, ctxt, hashKey = None):
     try:
+      # Folded literal
+      if self.constant != None:
+        ret = ( self.constant[0], True )
+      
       # Apply path
-      if any(self.path):
+      elif any(self.path):
         ret = ( super().apply(o, ctxt), True )
       
       # Auto-generate ID
       elif self.parentName:
-        ret = ( ids.new(self.parentName), True )
+        ret =                                                                 \
+          ( ids.new(self.parentName), True ) if hashKey == None               \
+          else ( hashIds.new(self.parentName, hashKey), True )
       
       # Error in schema
       else:
@@ -575,6 +821,9 @@ class SchemaProperty(SchemaType):
       
       return ret
     except BaseException as e:
+      if ctxt.stats and (self.isOptional or self.isConditional):
+        ctxt.stats.miss(self.parentName, self, self.isConditional)
+      
       if self.isOptional:
         return ( None, True )
       
@@ -583,6 +832,89 @@ class SchemaProperty(SchemaType):
       
       raise e
 
+#
+# Discriminator declared with @WHEN(...) on a node
+class SchemaDiscriminator:
+  
+  def __init__(self, s):
+    m = RE_When.match(s)
+    
+    if not m:
+      raise SyntaxError('Invalid discriminator: ' + s)
+    
+    self.token, literal, textLiteral = m.groups()
+    
+    # "literal" alone matches the element text
+    if textLiteral:
+      self.token = '_'
+      literal = textLiteral
+    
+    self.value = literal[1:-1] if literal else None
+  
+  #
+  # Value compared against {self.value}
+  def probe(self, o):
+    if self.token != '_':
+      o = o.get(self.token, None) if isinstance(o, dict) else None
+    
+    if isinstance(o, dict):
+      o = o.get('#text', None)
+    
+    return o if isPrimitive(o) else None
+  
+  def matches(self, o):
+    if self.value == None:
+      return isinstance(o, dict) and self.token in o
+    
+    return self.probe(o) == self.value
+
+#
+# Selects one structure out of overloads sharing the same tag. Overloads are
+# tried in declaration order, the first one whose discriminators all match is
+# selected. An overload without discriminator always matches.
+# Selection only depends on the element keys and on discriminated values, and
+# is thus memoized on these.
+class SchemaDispatcher:
+  
+  def __init__(self, nodes):
+    self.nodes = nodes
+    self.memo = {}
+    
+    # Discriminators whose outcome depends on more than the element keys, one
+    # per probed token
+    self.valued = list({
+      d.token: d for n in nodes for d in n.discriminators
+      if d.value != None
+    }.values())
+  
+  def shape(self, o):
+    return (
+      tuple(o.keys()) if isinstance(o, dict) else type(o),
+      tuple([ d.probe(o) for d in self.valued ])
+    )
+  
+  def resolve(self, o):
+    for node in self.nodes:
+      if all([ d.matches(o) for d in node.discriminators ]):
+        return node
+    
+    return None
+  
+  def select(self, o):
+    shape = self.shape(o)
+    
+    if shape in self.memo:
+      return self.memo[shape]
+    
+    node = self.resolve(o)
+    
+    if len(self.memo) >= CONST_Dispatch_Memo_Size:
+      self.memo.clear()
+    
+    self.memo[shape] = node
+    
+    return node
+
 #
 #
 class SchemaRelationship:
@@ -631,7 +963,7 @@ class SchemaRelationship:
       tgtNodePropMap = self.mapProps(o, self.tgtNodeProps, ctxt)
       rsPropMap = self.mapProps(o, self.rsProperties, ctxt)
       
-      ctxt.rsWriter.relationship(
+      ctxt.emitRelationship(
         expandVar(self.srcNode, ctxt, o),
         srcNodePropMap,
         expandVar(self.tgtNode, ctxt, o),
@@ -668,12 +1000,23 @@ class SchemaNode:
     self.isOptional = False
     self.isCollection = False
     self.isMerge = False
+    # Property names generated ids are derived from, [] for the whole
+    # element, None for sequential ids. See `@HASHID`
+    self.hashId = None
     self.label = None
     self.returnType = None
     self.tag = None
     
     self.alwaysRaise = False
     
+    # See SchemaDispatcher
+    self.discriminators = []
+    self.dispatcher = None
+    
+    # Conditional properties evaluated first: [ ( property, generated id
+    # properties declared before it ) ], see SchemaOptimizer.hoistGuards
+    self.guards = []
+    
     self.children = []
     self.properties = []
     self.returnTypeProperties = []
@@ -690,10 +1033,36 @@ class SchemaNode:
     
     if options:
       self.isMerge = '@MERGE' in options
+      self.discriminators = [
+        SchemaDiscriminator(d) for d in RE_When_Option.findall(options)
+      ]
+      
+      if self.discriminators:
+        self.dispatcher = SchemaDispatcher([ self ])
+      
+      m = RE_Hash_Id_Option.search(options)
+      if m:
+        self.hashId = [ p.strip() for p in (m.group(1) or '').split(',') if p.strip() ]
     
     # Parse properties
     self.properties = parseProperties(properties, self.label, ctxt)
     
+    # Hash keys are read from the node's own properties
+    if self.hashId != None:
+      if not any([ p.isGeneratedId for p in self.properties ]):
+        raise SyntaxError('@HASHID requires a generated id property, e.g. id:->id')
+      
+      names = [ p.typename for p in self.properties if not p.isGeneratedId ]
+      
+      for name in self.hashId:
+        if not name in names:
+          raise SyntaxError('Unknown @HASHID property: ' + name)
+    
+    # Function calls candidate for batching, see SchemaNode.prefetch
+    self.batchCalls = [
+      c for c in [ leadingFunction(p.path) for p in self.properties ] if c
+    ]
+    
     # Optional return type
     if returnTypeProperties:
       self.returnTypeProperties = parseProperties(returnTypeProperties, None, ctxt)
@@ -706,14 +1075,113 @@ class SchemaNode:
   def addChildNode(self, child):
     self.children.append(child)
   
+  #
+  # Elements of a collection of {count} prefetched at once: the smallest
+  # size of the batch functions this node or its overloads call, all of
+  # them if unbounded. 0 without batch functions.
+  def prefetchSize(self, count, ctxt):
+    nodes = self.dispatcher.nodes if self.dispatcher else [ self ]
+    functions = [
+      ctxt.functions.get(funcName, None)
+      for n in nodes for (_, funcName, _) in n.batchCalls
+    ]
+    sizes = [ f.size or count for f in functions if isinstance(f, BatchFunction) ]
+    
+    return max(1, min(sizes)) if sizes else 0
+  
+  #
+  # Call batch functions once for all {elements} of a collection (a chunk,
+  # see prefetchSize), and store results for SchemaBaseValue.traversePath.
+  # Parameters which cannot be evaluated ahead of their element are left to
+  # the regular call. Returns the keys of stored results.
+  def prefetch(self, elements, ctxt):
+    calls = {}
+    
+    for element in elements:
+      target = self.dispatcher.select(element) if self.dispatcher else self
+      
+      for (token, funcName, propsStr) in target.batchCalls if target else []:
+        f = ctxt.functions.get(funcName, None)
+        
+        if not isinstance(f, BatchFunction):
+          continue
+        
+        try:
+          params = functionParams(propsStr, element, ctxt)
+        except Exception:
+          params = None
+        
+        if params != None:
+          calls.setdefault(( token, f ), []).append(( id(element), params ))
+    
+    keys = []
+    
+    for (( token, f ), pending) in calls.items():
+      results = f.applyAll([ params for (_, params) in pending ])
+      
+      for (( elementId, _ ), result) in zip(pending, results):
+        key = ( token, elementId )
+        ctxt.batchResults[key] = result
+        keys.append(key)
+    
+    return keys
+  
+  #
+  # Apply the overload selected for {node}, if any. See SchemaDispatcher
+  def dispatch(self, node, ctxt):
+    if not self.dispatcher:
+      return self.apply_element(node, ctxt)
+    
+    target = self.dispatcher.select(node)
+    
+    if not target:
+      return False
+    
+    # Errors are handled by `apply` as the selected overload would
+    try:
+      return target.apply_element(node, ctxt)
+    
+    finally:
+      self.alwaysRaise = target.alwaysRaise
+  
   def apply_element(self, node, ctxt):
     self.alwaysRaise = False
     
+    if ctxt.metrics:
+      ctxt.metrics.record()
+    
     propMap = {}
     restoreCtxt = ctxt.newContext()
+    hashed = []
+    guarded = {}
+    # Values of @HASHID properties, including falsy ones propMap skips
+    keyValues = {}
+    
+    # Rejected elements still consume the ids generated before the guard in
+    # declaration order
+    for (prop, replay) in self.guards:
+      ret = prop.apply(node, ctxt)
+      
+      if not ret[1]:
+        for p in replay:
+          ids.new(p.parentName)
+        
+        ctxt.variables = restoreCtxt.variables
+        return False
+      
+      guarded[prop] = ret
   
     for prop in self.properties:
-      ret = prop.apply(node, ctxt)
+      # Hashed ids are derived from other properties, keep their position
+      if self.hashId != None and prop.isGeneratedId:
+        propMap[prop.typename] = None
+        hashed.append(prop)
+        continue
+      
+      ret = guarded[prop] if prop in guarded else prop.apply(node, ctxt)
+      
+      if self.hashId and ret[1] and prop.typename in self.hashId:
+        keyValues[prop.typename] = ret[0]
       
       if ret[0] and ret[1] and prop.typename:
         propMap[prop.typename] = ret[0]
@@ -722,6 +1190,15 @@ class SchemaNode:
         ctxt.variables = restoreCtxt.variables
         return False
     
+    for prop in hashed:
+      hashKey =                                                               \
+        [ keyValues.get(p, None) for p in self.hashId ] if self.hashId        \
+        else node
+      
+      propMap[prop.typename] = prop.apply(node, ctxt, hashKey)[0]
+    
+    record = None
+    
     if self.returnType:
       scopedCtxt = ctxt.newContext()
       
@@ -732,13 +1209,24 @@ class SchemaNode:
         raiseError(node, ctxt, ValueError, '->' + self.returnType, 'No such type: ' + self.returnType)
       
     elif self.label:
-      ctxt.nodeWriter.node(self.label, propMap, self.isMerge)
+      # Outermost node of a record: its descendants and the relationships
+      # between them are written with it, once children are applied
+      if ctxt.colocate and ctxt.record == None:
+        record = ctxt.record = CypherWriter.CypherRecord()
+      
+      ctxt.emitNode(self.label, propMap, self.isMerge)
     
     self.alwaysRaise = True
     
-    scopedCtxt = ctxt.newContext()
-    for child in self.children:
-      child.apply(node, scopedCtxt)
+    try:
+      scopedCtxt = ctxt.newContext()
+      for child in self.children:
+        child.apply(node, scopedCtxt)
+    
+    finally:
+      if record != None:
+        ctxt.record = None
+        ctxt.nodeWriter.record(record)
     
     return True
 
@@ -749,7 +1237,7 @@ class SchemaNode:
       self.alwaysRaise = False
       
       if self.returnType or not self.tag:
-        return self.apply_element(o, ctxt)
+        return self.dispatch(o, ctxt)
       
       else:
         node = extractVar(self.tag, ctxt, o)
@@ -758,7 +1246,7 @@ class SchemaNode:
           if not node:
             node = o[expandVar(self.tag, ctxt, o)]
           
-          return self.apply_element(node, ctxt)
+          return self.dispatch(node, ctxt)
         
         else:
           scopedCtxt = ctxt.newContext()
@@ -766,8 +1254,23 @@ class SchemaNode:
           if not node:
             node = o[expandVar(self.tag, scopedCtxt, o)]
           
-          for childNode in normalizeDict(node):
-            ret = self.apply_element(childNode, scopedCtxt)
+          elements = normalizeDict(node)
+          size = self.prefetchSize(len(elements), scopedCtxt)
+          
+          # Results of batch functions are computed and used one chunk at a
+          # time
+          for start in range(0, len(elements), size or len(elements) or 1):
+            chunk = elements[start:start + size] if size else elements
+            keys = self.prefetch(chunk, scopedCtxt) if size else []
+            
+            try:
+              for childNode in chunk:
+                ret = self.dispatch(childNode, scopedCtxt)
+            
+            # Discard results of elements which were not evaluated
+            finally:
+              for key in keys:
+                scopedCtxt.batchResults.pop(key, None)
 
       return ret
     except BaseException as e:
@@ -812,10 +1315,16 @@ class X2CSchema:
   def __init__(self, root, ctxt):
     self.root = root
     self.context = ctxt
+    self.projectionCache = None
 
   #
   # Apply defined schema to node object
-  def apply(self, o, nodeWriter, rsWriter, userFunctions = None, uncheckedTypes = False):
+  # {metrics}, if specified, is a `Metrics.Metrics` instance fed with progress
+  # from nodes and both writers. A final report is sent once done.
+  # With {colocate}, each outermost node is written in a single statement
+  # together with its descendant nodes and the relationships between them.
+  # Only relationships crossing records are deferred to {rsWriter}.
+  def apply(self, o, nodeWriter, rsWriter, userFunctions = None, uncheckedTypes = False, metrics = None, colocate = False):
     if userFunctions != None:
       self.context.functions = userFunctions
     
@@ -823,8 +1332,135 @@ class X2CSchema:
     self.context.rsWriter = rsWriter
     
     self.context.uncheckedTypes = uncheckedTypes
+    self.context.metrics = metrics
+    self.context.colocate = colocate
+    self.context.stats =                                                      \
+      nodeWriter if isinstance(nodeWriter, StatsWriter.StatsWriter) else None
+    
+    if metrics:
+      metrics.attach(nodeWriter)
+      metrics.attach(rsWriter)
     
     self.root.apply(o, self.context)
+    
+    if metrics:
+      metrics.report()
+  
+  #
+  # Parse and apply defined schema to XML file {filename}, optionally
+  # compressed. See `InputHelper.InputFile`, and `apply` for other arguments
+  # With {project}, elements and attributes the schema never reads are
+  # skipped while parsing, see `projection`. {chunkSize} bytes are parsed at
+  # once.
+  def applyFile(self, filename, nodeWriter, rsWriter, *args, project = True,
+                chunkSize = InputHelper.CONST_Chunk_Size, **kwargs):
+    o = InputHelper.loadDocument(
+      filename,
+      kwargs.get('metrics', None),
+      self.projection() if project else None,
+      chunkSize
+    )
+    
+    self.apply(o, nodeWriter, rsWriter, *args, **kwargs)
+  
+  #
+  # Evaluate defined schema against node object without writing anything,
+  # and return counts of what would have been written. See
+  # `StatsWriter.StatsWriter.report` and `apply` for other arguments
+  def dryRun(self, o, *args, **kwargs):
+    stats = StatsWriter.StatsWriter()
+    self.apply(o, stats, stats, *args, **kwargs)
+    
+    return stats.report()
+  
+  #
+  # Same as `dryRun`, for XML file {filename}. See `applyFile`
+  def dryRunFile(self, filename, *args, **kwargs):
+    stats = StatsWriter.StatsWriter()
+    self.applyFile(filename, stats, stats, *args, **kwargs)
+    
+    return stats.report()
+  
+  #
+  # Iterate over statements (or records) written by applying defined schema
+  # to {source}, a node object or an XML file name, as they are produced.
+  # See `StatementWriter.iterStatements`
+  def iterStatements(self, source, *args, **kwargs):
+    return StatementWriter.iterStatements(self, source, *args, **kwargs)
+  
+  #
+  # Elements and attributes this schema may read, see
+  # `SchemaAnalysis.projection`. Elements only read as collections are always
+  # parsed as lists.
+  def projection(self):
+    # Schema analysis (imports this module)
+    import SchemaAnalysis
+    
+    if not self.projectionCache:
+      self.projectionCache = SchemaAnalysis.projection(self)
+    
+    return self.projectionCache
+  
+  #
+  # Cache hits and misses of user functions registered as pure
+  def functionStats(self):
+    return {
+      name: f.cacheInfo()
+      for (name, f) in self.context.functions.items()
+      if isinstance(f, PureFunction)
+    }
+
+#
+# Several schemas applied to the same documents, each with its own writers.
+# Documents are parsed once, keeping the elements any of the schemas reads,
+# but each schema still walks the parsed document in turn: evaluation costs
+# the sum of the schemas' costs.
+class X2CMultiSchema:
+  
+  def __init__(self, schemas):
+    self.schemas = list(schemas)
+    self.projectionCache = None
+  
+  #
+  # Apply each schema to node object, writing to its ( nodeWriter, rsWriter )
+  # pair in {writers}. {userFunctions} is either shared by all schemas, or a
+  # list of one dictionary per schema. See `X2CSchema.apply` for other
+  # arguments
+  def apply(self, o, writers, userFunctions = None, *args, **kwargs):
+    if not isinstance(userFunctions, list):
+      userFunctions = [ userFunctions ] * len(self.schemas)
+    
+    if len(writers) != len(self.schemas):
+      raise ValueError('Expected %d writer pairs, got %d' % (len(self.schemas), len(writers)))
+    
+    for (schema, (nodeWriter, rsWriter), functions) in zip(self.schemas, writers, userFunctions):
+      schema.apply(o, nodeWriter, rsWriter, functions, *args, **kwargs)
+  
+  #
+  # Parse XML file {filename} once and apply each schema, see
+  # `X2CSchema.applyFile`
+  def applyFile(self, filename, writers, *args, project = True,
+                chunkSize = InputHelper.CONST_Chunk_Size, **kwargs):
+    o = InputHelper.loadDocument(
+      filename,
+      kwargs.get('metrics', None),
+      self.projection() if project else None,
+      chunkSize
+    )
+    
+    self.apply(o, writers, *args, **kwargs)
+  
+  #
+  # Elements and attributes any of the schemas may read, see
+  # `SchemaAnalysis.union`
+  def projection(self):
+    # Schema analysis (imports this module)
+    import SchemaAnalysis
+    
+    if not self.projectionCache:
+      self.projectionCache = SchemaAnalysis.union([ s.projection() for s in self.schemas ])
+    
+    return self.projectionCache
 
 #
 #
@@ -955,7 +1591,8 @@ class SchemaParser:
     
     self.lineCount += 1
 
-def parse(schema):
+# With {optimize}, see SchemaOptimizer.optimize
+def parse(schema, optimize = False):
   sp = SchemaParser()
   
   with open(schema, 'r') as fp:
@@ -964,5 +1601,17 @@ def parse(schema):
   
   # Create root node
   root = SchemaRoot(sp.rootStack)
+  x2c = X2CSchema(root, sp.context)
   
-  return X2CSchema(root, sp.context)
+  if optimize:
+    # Schema optimizer (imports this module)
+    import SchemaOptimizer
+    
+    SchemaOptimizer.optimize(x2c)
+  
+  return x2c
+
+# Command line, see X2CCommand
+if __name__ == "__main__":
+  import X2CCommand
+  sys.exit(X2CCommand.main())
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+
+# Shared by the tests of this directory
+
+# Test framework
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+# X2C
+import CypherWriter
+import IdHelper
+import Xml2Cypher
+
+
+#
+#
+# Constants
+CONST_Example_Dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'example')
+CONST_Example_Schema = os.path.join(CONST_Example_Dir, 'songs.schema')
+CONST_Example_Document = os.path.join(CONST_Example_Dir, 'songs.xml')
+
+
+#
+# User functions of the example schema
+def parseTags(params):
+  return params['tags'].split(' ')
+
+CONST_Example_Functions = { 'parseTags': parseTags }
+
+
+#
+# ( nodes, relationships ) Cypher written by {x2c} for XML file {filename},
+# sequential ids reset first. {writerOptions} are passed to both writers.
+def convert(x2c, filename, userFunctions = None, applyOptions = None, **writerOptions):
+  nodeWriter = CypherWriter.CypherWriter(io.StringIO(), **writerOptions)
+  rsWriter = CypherWriter.CypherWriter(io.StringIO(), **writerOptions)
+
+  IdHelper.IdHelper.idDict.clear()
+  x2c.applyFile(filename, nodeWriter, rsWriter, userFunctions, **(applyOptions or {}))
+  nodeWriter.close()
+  rsWriter.close()
+
+  return ( nodeWriter.file.getvalue(), rsWriter.file.getvalue() )
+
+
+#
+# Test case with a temporary directory, removed after each test
+class TempDirTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.dir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.dir)
+
+  #
+  # Write {content} to {name} in the temporary directory, return its path
+  def write(self, name, content):
+    filename = os.path.join(self.dir, name)
+
+    with open(filename, "w", encoding="utf8") as fd:
+      fd.write(content)
+
+    return filename
+
+  #
+  # Parse schema {content}
+  def parse(self, content, optimize = False):
+    return Xml2Cypher.parse(self.write('test.schema', content), optimize)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+
+# Test framework
+import gzip
+import os
+import shutil
+import unittest
+
+# X2C
+import IdHelper
+import X2CBatch
+import Xml2Cypher
+
+# Tests
+import helpers
+
+
+#
+#
+# Tests
+
+class ConvertMergedTest(helpers.TempDirTestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.sources = []
+
+    for i in range(4):
+      filename = os.path.join(self.dir, 'songs%d.xml' % i)
+      shutil.copy(helpers.CONST_Example_Document, filename)
+      self.sources.append(filename)
+
+    IdHelper.IdHelper.idDict.clear()
+
+  #
+  # Statements of each :begin / :commit block of file {filename}
+  def transactions(self, filename):
+    with open(filename, encoding="utf8") as fd:
+      content = fd.read()
+
+    blocks = content.split(":commit\n")
+    self.assertEqual(blocks[-1], "")
+
+    for block in blocks[:-1]:
+      self.assertTrue(block.startswith(":begin\n"))
+
+    return [ block.count(";\n") for block in blocks[:-1] ]
+
+  def testTransactionSize(self):
+    schema = Xml2Cypher.parse(helpers.CONST_Example_Schema)
+    outputs = X2CBatch.convertFiles(
+      schema, self.sources, os.path.join(self.dir, 'out'), helpers.CONST_Example_Functions,
+      workers = 2, transactionSize = 5
+    )
+
+    for filename in outputs:
+      counts = self.transactions(filename)
+
+      self.assertGreater(len(counts), 2)
+      self.assertEqual(set(counts[:-1]), { 5 })
+      self.assertLessEqual(counts[-1], 5)
+
+    # 4 files of 12 node statements
+    self.assertEqual(sum(self.transactions(outputs[0])), 48)
+
+class ConvertPerFileTest(helpers.TempDirTestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.schema = Xml2Cypher.parse(helpers.CONST_Example_Schema)
+
+  def copy(self, name):
+    filename = os.path.join(self.dir, name)
+
+    with open(helpers.CONST_Example_Document, 'rb') as fd:
+      content = fd.read()
+
+    with (gzip.open if name.endswith('.gz') else open)(filename, 'wb') as fd:
+      fd.write(content)
+
+    return filename
+
+  def testOutputNames(self):
+    sources = [ self.copy('feed_v3.4.xml'), self.copy('feed_v3.5.xml.gz') ]
+    outputs = X2CBatch.convertFiles(
+      self.schema, sources, os.path.join(self.dir, 'out'), helpers.CONST_Example_Functions,
+      workers = 2, merge = False
+    )
+
+    self.assertEqual([ os.path.basename(f) for f in outputs ], [
+      'feed_v3.4-nodes.cql', 'feed_v3.4-relationships.cql',
+      'feed_v3.5-nodes.cql', 'feed_v3.5-relationships.cql'
+    ])
+
+    for filename in outputs:
+      self.assertGreater(os.path.getsize(filename), 0)
+
+  def testDuplicateOutputNames(self):
+    sources = [ self.copy('songs.xml'), self.copy('songs.xml.gz') ]
+
+    with self.assertRaises(ValueError):
+      X2CBatch.convertFiles(
+        self.schema, sources, os.path.join(self.dir, 'out'), helpers.CONST_Example_Functions,
+        workers = 2, merge = False
+      )
+
+class CommandTest(helpers.TempDirTestCase):
+
+  def testOptions(self):
+    output = os.path.join(self.dir, 'out')
+    argv = [
+      helpers.CONST_Example_Schema, helpers.CONST_Example_Document, '-o', output,
+      '-f', 'helpers', '--per-file', '--no-projection', '--chunk-size', '64'
+    ]
+
+    self.assertEqual(X2CBatch.main(argv), 0)
+    self.assertEqual(
+      sorted(os.listdir(output)), [ 'songs-nodes.cql', 'songs-relationships.cql' ]
+    )
+
+    with self.assertRaises(SystemExit):
+      X2CBatch.main(argv + [ '--writer', 'jsonl' ])
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+
+# Test framework
+import time
+import unittest
+
+# X2C
+import BoltWriter
+import Xml2Cypher
+
+# Tests
+import helpers
+
+
+#
+# RecordingDriver keeping track of MERGE transactions running at once
+class OverlapDriver(BoltWriter.RecordingDriver):
+
+  def __init__(self):
+    super().__init__()
+    self.active = 0
+    self.maxActive = 0
+
+  def session(self, database = None):
+    return OverlapSession(self, database)
+
+class OverlapSession(BoltWriter.RecordingSession):
+
+  def begin_transaction(self):
+    return OverlapTransaction(self.driver, self.database)
+
+class OverlapTransaction(BoltWriter.RecordingTransaction):
+
+  def commit(self):
+    if not any(s.startswith('MERGE') for s in self.statements):
+      return super().commit()
+
+    with self.driver.lock:
+      self.driver.active += 1
+      self.driver.maxActive = max(self.driver.maxActive, self.driver.active)
+
+    try:
+      time.sleep(0.01)
+      super().commit()
+
+    finally:
+      with self.driver.lock:
+        self.driver.active -= 1
+
+
+#
+#
+# Tests
+
+class BoltWriterTest(unittest.TestCase):
+
+  def testSerialMerge(self):
+    x2c = Xml2Cypher.parse(helpers.CONST_Example_Schema)
+    driver = OverlapDriver()
+    writer = BoltWriter.BoltWriter(driver, transactionSize = 1, concurrency = 4)
+
+    x2c.applyFile(
+      helpers.CONST_Example_Document, writer, writer,
+      helpers.CONST_Example_Functions
+    )
+    writer.close()
+
+    statements = driver.statements()
+    merges = [ s for s in statements if s.startswith('MERGE') ]
+
+    # 3 songs of 2 tags
+    self.assertEqual(len(merges), 6)
+    self.assertEqual(writer.report()['statements'], len(statements))
+    self.assertEqual(driver.maxActive, 1)
+
+if __name__ == '__main__':
+  unittest.main()
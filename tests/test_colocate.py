@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+
+# Test framework
+import unittest
+
+# X2C
+import CypherWriter
+import IdHelper
+import StatementWriter
+import Xml2Cypher
+
+# Tests
+import helpers
+
+
+#
+#
+# Constants
+CONST_Document = """<library>
+  <genre name="rock"/>
+  <song><title>Again</title><artist>Archive</artist></song>
+  <song><title>Noise</title><artist>Archive</artist></song>
+</library>
+"""
+
+# AUTHORED within records, IN_GENRE across them
+CONST_Schema = """structures:
+  :library()
+    Genre:genre(id:->id, name:@name->string)[]
+    Song:song(id:->id, title:title->string)[]
+      Artist:artist(id:->id, name:_->string)
+        Artist(id:${ArtistId}->id)-[AUTHORED()]->Song(id:${SongId}->id)
+      Song(id:${SongId}->id)-[IN_GENRE()]->Genre(name:"rock"->string)
+schema:
+  :library()->library()
+"""
+
+
+#
+#
+# Tests
+
+class ColocateTest(helpers.TempDirTestCase):
+
+  #
+  # Nodes and relationships written by {x2c} for {filename}, relationship
+  # endpoints being the nodes they match
+  def graph(self, x2c, filename, userFunctions = None, colocate = False):
+    items = []
+    writer = StatementWriter.RecordWriter(items.append)
+
+    IdHelper.IdHelper.idDict.clear()
+    x2c.applyFile(filename, writer, writer, userFunctions, colocate = colocate)
+
+    nodes = [ item[1:] for item in items if item[0] == 'node' ]
+    index = CypherWriter.NodeIndex()
+
+    for (i, (label, properties, _)) in enumerate(nodes):
+      index.add(label, properties, i)
+
+    relationships = sorted([
+      ( index.findAll(lbl1, props1), index.findAll(lbl2, props2), rsName, rsProps or {} )
+      for (lbl1, props1, lbl2, props2, rsName, rsProps) in [
+        item[1:] for item in items if item[0] == 'relationship'
+      ]
+    ], key = repr)
+
+    return ( nodes, relationships )
+
+  def testExample(self):
+    x2c = Xml2Cypher.parse(helpers.CONST_Example_Schema)
+    filename = helpers.CONST_Example_Document
+    userFunctions = helpers.CONST_Example_Functions
+
+    (nodes, relationships) =                                                  \
+      helpers.convert(x2c, filename, userFunctions, { 'colocate': True })
+
+    # One statement per song, nothing deferred
+    self.assertEqual(nodes.count(';\n'), 3)
+    self.assertEqual(nodes.count('CREATE (n1)-[:AUTHORED]->(n0)'), 3)
+    self.assertEqual(relationships, '')
+
+    self.assertEqual(
+      self.graph(x2c, filename, userFunctions, True),
+      self.graph(x2c, filename, userFunctions)
+    )
+
+  def testCrossRecord(self):
+    x2c = self.parse(CONST_Schema)
+    filename = self.write('library.xml', CONST_Document)
+
+    (nodes, relationships) = helpers.convert(x2c, filename, None, { 'colocate': True })
+
+    self.assertEqual(nodes.count(';\n'), 3)
+    self.assertEqual(nodes.count('-[:AUTHORED]->'), 2)
+    self.assertNotIn('IN_GENRE', nodes)
+
+    self.assertEqual(relationships.count(';\n'), 2)
+    self.assertEqual(relationships.count('-[:IN_GENRE]->'), 2)
+    self.assertNotIn('AUTHORED', relationships)
+
+    (nodes, relationships) = self.graph(x2c, filename, None, True)
+
+    self.assertEqual(( nodes, relationships ), self.graph(x2c, filename))
+    self.assertEqual(
+      [ ( len(src), len(tgt) ) for (src, tgt, _, _) in relationships ], [ ( 1, 1 ) ] * 4
+    )
+
+if __name__ == '__main__':
+  unittest.main()
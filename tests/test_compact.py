@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+
+# Test framework
+import re
+import unittest
+
+# X2C
+import Xml2Cypher
+
+# Tests
+import helpers
+
+
+#
+#
+# Constants
+
+# Separators and quotes within values
+CONST_Document = """<songs>
+  <song tags="live rock">
+    <title>Time: Live,  at "Pompeii" (1972)</title>
+    <artist>Pink Floyd</artist>
+  </song>
+  <song tags="trip-hop">
+    <title>Again</title>
+    <artist>Archive</artist>
+  </song>
+</songs>
+"""
+
+
+#
+# Tokens of each of Cypher {statements}, whitespace and transactions aside,
+# with variables renamed by order of appearance within each statement.
+# Sorted, as the 'key' order of relationships depends on how their endpoints
+# are written.
+def tokens(statements):
+  result = []
+  statements = re.sub(r'^:(begin|commit)\n', '', statements, flags = re.MULTILINE)
+
+  for statement in statements.split(';\n'):
+    names = {}
+    tokens = re.findall(r'"(?:[^"\\\\]|\\\\.)*"|\w+|[^\w\s]', statement)
+
+    for (i, token) in enumerate(tokens):
+      if i > 0 and tokens[i - 1] == '(' and re.match(r'\w', token):
+        tokens[i] = names.setdefault(token, 'v%d' % len(names))
+
+      elif token in names:
+        tokens[i] = names[token]
+
+    result.append(tokens)
+
+  return sorted(result)
+
+
+#
+#
+# Tests
+
+class CompactTest(helpers.TempDirTestCase):
+
+  #
+  # Regular and compact Cypher written for {filename}
+  def outputs(self, filename, **options):
+    x2c = Xml2Cypher.parse(helpers.CONST_Example_Schema)
+    applyOptions = { 'colocate': options.pop('colocate', False) }
+
+    return [
+      helpers.convert(
+        x2c, filename, helpers.CONST_Example_Functions, applyOptions,
+        compact = compact, **options
+      )
+      for compact in [ False, True ]
+    ]
+
+  def testSameStatements(self):
+    filenames = [ helpers.CONST_Example_Document, self.write('songs.xml', CONST_Document) ]
+    options = [ {}, { 'colocate': True }, { 'transactionSize': 2 } ]
+
+    for filename in filenames:
+      for o in options:
+        (regular, compact) = self.outputs(filename, **o)
+
+        for (r, c) in zip(regular, compact):
+          self.assertEqual(tokens(c), tokens(r))
+          self.assertEqual(c.count(':commit'), r.count(':commit'))
+
+        self.assertLess(len(''.join(compact)), len(''.join(regular)))
+
+  def testValues(self):
+    (_, (nodes, relationships)) = self.outputs(self.write('songs.xml', CONST_Document))
+
+    self.assertIn('CREATE(:Song{id:1,title:"Time: Live,  at \\"Pompeii\\" (1972)"})', nodes)
+    self.assertIn('MATCH(a:Artist{id:1})\nMATCH(b:Song{id:1})\nCREATE(a)-[:AUTHORED]->(b)', relationships)
+    self.assertIn('MERGE(:Tag{id:1,name:"live"})', nodes)
+
+if __name__ == '__main__':
+  unittest.main()
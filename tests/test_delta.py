@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+
+# Test framework
+import gzip
+import json
+import os
+import unittest
+
+# X2C
+import DeltaWriter
+import IdHelper
+
+# Tests
+import helpers
+
+
+#
+#
+# Constants
+CONST_Schema = """structures:
+  :songs()
+    Song:song(id:->id, title:title->string, year:year->int)[]
+      Artist:artist(id:->id, name:_->string)
+        Artist(id:${ArtistId}->id)-[AUTHORED()]->Song(id:${SongId}->id)
+schema:
+  :songs()->songs()
+"""
+
+CONST_Document = """<songs>
+  <song><title>Again</title><year>2002</year><artist>Archive</artist></song>
+  <song><title>Noise</title><year>2004</year><artist>Archive</artist></song>
+</songs>
+"""
+
+# Again changed, Noise gone, Lights new
+CONST_Changed_Document = """<songs>
+  <song><title>Again</title><year>2003</year><artist>Archive</artist></song>
+  <song><title>Lights</title><year>2004</year><artist>Archive</artist></song>
+</songs>
+"""
+
+CONST_Keys = { 'Song': [ 'title' ], 'Artist': [ 'name' ] }
+
+
+#
+#
+# Tests
+
+class DeltaTest(helpers.TempDirTestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.x2c = self.parse(CONST_Schema)
+    self.manifest = os.path.join(self.dir, 'songs.manifest')
+
+  #
+  # ( report, Cypher ) of a delta run on {content}
+  def delta(self, content):
+    filename = self.write('songs.xml', content)
+    output = os.path.join(self.dir, 'delta.cql')
+    delta = DeltaWriter.DeltaWriter(output, self.manifest, CONST_Keys)
+
+    IdHelper.IdHelper.idDict.clear()
+    self.x2c.applyFile(filename, delta, delta)
+    delta.close()
+
+    with open(output, encoding="utf8") as fd:
+      return ( delta.report(), fd.read() )
+
+  #
+  # Rewrite the manifest with {change}(data)
+  def rewriteManifest(self, change):
+    with gzip.open(self.manifest, 'rt', encoding="utf8") as fd:
+      data = json.load(fd)
+
+    change(data)
+
+    with gzip.open(self.manifest, 'wt', encoding="utf8") as fd:
+      json.dump(data, fd)
+
+  def testRuns(self):
+    (report, cypher) = self.delta(CONST_Document)
+
+    # Archive once, by its natural key
+    self.assertEqual(report, { 'created': 3, 'updated': 0, 'deleted': 0, 'unchanged': 0 })
+    self.assertEqual(cypher.count('CREATE (a)-[:AUTHORED'), 2)
+
+    # Round trip: nothing changed, nothing written
+    (report, cypher) = self.delta(CONST_Document)
+
+    self.assertEqual(report, { 'created': 0, 'updated': 0, 'deleted': 0, 'unchanged': 3 })
+    self.assertEqual(cypher.strip(), '')
+
+    (report, cypher) = self.delta(CONST_Changed_Document)
+
+    self.assertEqual(report, { 'created': 1, 'updated': 1, 'deleted': 1, 'unchanged': 1 })
+    self.assertIn('SET n = {title: "Again", year: 2003}, n.id = k0', cypher)
+    self.assertIn('CREATE (:Song{id: 2, title: "Lights", year: 2004})', cypher)
+    self.assertIn('MATCH (n:Song{title: "Noise"})\nDETACH DELETE n', cypher)
+    # Only the new song's relationship, the deleted one goes with its node
+    self.assertEqual(cypher.count('-[:AUTHORED'), 1)
+    self.assertNotIn('DELETE r', cypher)
+
+  def testTamperedManifest(self):
+    self.delta(CONST_Document)
+    self.rewriteManifest(lambda data: data['nodes'][0].__setitem__(2, '0' * 16))
+
+    with self.assertRaises(ValueError):
+      self.delta(CONST_Document)
+
+    with open(self.manifest, 'wb') as fd:
+      fd.write(b'not a manifest')
+
+    with self.assertRaises(ValueError):
+      self.delta(CONST_Document)
+
+  def testVersionMismatch(self):
+    self.delta(CONST_Document)
+    self.rewriteManifest(lambda data: data.__setitem__('version', 0))
+
+    with self.assertRaises(ValueError):
+      self.delta(CONST_Document)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+
+# Test framework
+import unittest
+
+# X2C
+import StatementWriter
+
+# Tests
+import helpers
+
+
+#
+#
+# Constants
+CONST_Schema = """structures:
+  Song:item(title:title->string)[]@WHEN(@kind="song")
+  Album:item(name:name->string)[]@WHEN(@kind="album")
+    Track:track(title:_->string)[]
+schema:
+  :catalog()
+    :item()[]->item()
+"""
+
+CONST_Document = """<catalog>
+  <item kind="song"><title>Again</title></item>
+  <item kind="album"><name>Noise</name><track>Again</track><track>Noise</track></item>
+  <item kind="video"><title>Again</title></item>
+</catalog>
+"""
+
+# Optional overloads: elements they apply to still report errors of their
+# children, as without @WHEN
+CONST_Optional_Schema = """structures:
+  ?Song:item(title:title->string)[]@WHEN(@kind="song")
+  ?Album:item(name:name->string)[]@WHEN(@kind="album")
+    :sub()
+schema:
+  :catalog()
+    :item()[]->item()
+"""
+
+
+#
+#
+# Tests
+
+class DispatchTest(helpers.TempDirTestCase):
+
+  #
+  # ( label, properties ) of the nodes written by {x2c} for {document}
+  def nodes(self, x2c, document):
+    items = []
+    writer = StatementWriter.RecordWriter(items.append)
+    x2c.applyFile(self.write('catalog.xml', document), writer, writer)
+
+    return [ ( item[1], item[2] ) for item in items if item[0] == 'node' ]
+
+  def testSelect(self):
+    self.assertEqual(self.nodes(self.parse(CONST_Schema), CONST_Document), [
+      ( 'Song', { 'title': 'Again' } ),
+      ( 'Album', { 'name': 'Noise' } ),
+      ( 'Track', { 'title': 'Again' } ),
+      ( 'Track', { 'title': 'Noise' } )
+    ])
+
+  def testNoOverload(self):
+    document = '<catalog><item kind="video"><title>Again</title></item></catalog>'
+
+    self.assertEqual(self.nodes(self.parse(CONST_Schema), document), [])
+
+  def testOverloadError(self):
+    x2c = self.parse(CONST_Optional_Schema)
+    document = '<catalog><item kind="album"><name>Noise</name></item></catalog>'
+
+    with self.assertRaises(KeyError):
+      self.nodes(x2c, document)
+
+    # Rejected by its own properties, the element is skipped
+    document = '<catalog><item kind="album"><title>Noise</title></item></catalog>'
+
+    self.assertEqual(self.nodes(x2c, document), [])
+
+  def testMismatchedOverloads(self):
+    for (old, new) in [ ( '?Album', 'Album' ), ( 'name->string)[]', 'name->string)' ) ]:
+      with self.assertRaises(SyntaxError):
+        self.parse(CONST_Optional_Schema.replace(old, new))
+
+if __name__ == '__main__':
+  unittest.main()
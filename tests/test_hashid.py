@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+
+# Test framework
+import unittest
+
+# X2C
+import IdHelper
+import StatementWriter
+import Xml2Cypher
+
+# Tests
+import helpers
+
+
+#
+#
+# Constants
+CONST_Document = """<library>
+  <song kind="live">
+    <title>Again</title>
+    <credit role="vocals">Craig Walker</credit>
+    <credit role="guitar">Danny Griffiths</credit>
+  </song>
+  <song>
+    <title>Again</title>
+    <credit role="vocals">Dave Pen</credit>
+  </song>
+</library>
+"""
+
+CONST_Song_Schema = """structures:
+  :library()
+    Song:song(id:->id, title:title->string)[]@HASHID
+schema:
+  :library()->library()
+"""
+
+CONST_Credit_Schema = """structures:
+  :library()
+    :song()[]
+      Person:credit(id:->id, role:@role->string)[]
+schema:
+  :library()->library()
+"""
+
+
+#
+#
+# Tests
+
+class HashIdTest(helpers.TempDirTestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.document = self.write('library.xml', CONST_Document)
+
+  #
+  # Properties of the nodes written by {apply}(writers)
+  def nodes(self, apply):
+    items = []
+    writer = StatementWriter.RecordWriter(items.append)
+    apply(writer, writer)
+
+    return [ item[2] for item in items if item[0] == 'node' ]
+
+  def testProjection(self):
+    x2c = self.parse(CONST_Song_Schema)
+    multi = Xml2Cypher.X2CMultiSchema([ x2c, self.parse(CONST_Credit_Schema) ])
+
+    projected = self.nodes(lambda n, r: x2c.applyFile(self.document, n, r))
+    whole = self.nodes(lambda n, r: x2c.applyFile(self.document, n, r, project = False))
+    union = self.nodes(
+      lambda n, r: multi.applyFile(self.document, [ ( n, r ), ( n, r ) ])
+    )
+
+    ids = [ p['id'] for p in projected ]
+
+    # Same titles, other credits
+    self.assertEqual(len(set(ids)), 2)
+    self.assertEqual([ p['id'] for p in whole ], ids)
+    self.assertEqual([ p['id'] for p in union if 'title' in p ], ids)
+
+  def testUnknownProperty(self):
+    with self.assertRaises(SyntaxError):
+      self.parse(CONST_Song_Schema.replace('@HASHID', '@HASHID(title, nme)'))
+
+  def testNoGeneratedId(self):
+    for option in [ '@HASHID', '@HASHID(title)' ]:
+      with self.assertRaises(SyntaxError):
+        self.parse(CONST_Song_Schema.replace('id:->id, ', '').replace('@HASHID', option))
+
+  def testFalsyKeys(self):
+    x2c = self.parse(
+      CONST_Song_Schema.replace('title:title->string)[]@HASHID',
+                                '?rank:@rank->int)[]@HASHID(rank)')
+    )
+    document = self.write(
+      'ranks.xml', '<library><song rank="0"/><song/><song rank="0"/></library>'
+    )
+
+    ids = [ p['id'] for p in self.nodes(lambda n, r: x2c.applyFile(document, n, r)) ]
+
+    self.assertNotEqual(ids[0], ids[1])
+    self.assertEqual(ids[0], ids[2])
+
+  def testSeenBound(self):
+    helper = IdHelper.HashIdHelper(maxSeen = 2)
+    ids = [ helper.new('Song', i) for i in range(4) ]
+
+    self.assertEqual(helper.seenCount, 2)
+    self.assertEqual([ helper.new('Song', i) for i in range(4) ], ids)
+
+    # Recorded ids are still checked
+    helper.seen['Song'][ids[0]] += 1
+
+    with self.assertRaises(ValueError):
+      helper.new('Song', 0)
+
+if __name__ == '__main__':
+  unittest.main()
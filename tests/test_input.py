@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+
+# Test framework
+import bz2
+import gzip
+import lzma
+import unittest
+
+# X2C
+import InputHelper
+import Xml2Cypher
+
+# Tests
+import helpers
+
+
+#
+#
+# Constants
+
+# Extension: ( codec, compress )
+CONST_Codecs = {
+  '': ( None, None ),
+  '.gz': ( 'gzip', gzip.compress ),
+  '.bz2': ( 'bz2', bz2.compress ),
+  '.xz': ( 'xz', lzma.compress )
+}
+
+
+#
+# Stands for Metrics.Metrics, counts input bytes
+class InputBytes:
+
+  def __init__(self):
+    self.count = 0
+
+  def addInputBytes(self, count):
+    self.count += count
+
+
+#
+#
+# Tests
+
+class InputTest(helpers.TempDirTestCase):
+
+  def setUp(self):
+    super().setUp()
+
+    with open(helpers.CONST_Example_Document, 'rb') as fd:
+      self.content = fd.read()
+
+  #
+  # Write example document to songs.xml{extension}, compressed with {compress}
+  def copy(self, extension, compress):
+    filename = self.write('songs.xml' + extension, '')
+
+    with open(filename, 'wb') as fd:
+      fd.write(compress(self.content) if compress else self.content)
+
+    return filename
+
+  def testCodecs(self):
+    for (extension, (codec, compress)) in CONST_Codecs.items():
+      filename = self.copy(extension, compress)
+      metrics = InputBytes()
+
+      self.assertEqual(InputHelper.detectCodec(filename), codec)
+
+      with InputHelper.InputFile(filename, metrics) as fd:
+        # Uncompressed files are mapped
+        self.assertEqual(fd.map != None, codec == None)
+        self.assertEqual(fd.read(100) + fd.read(), self.content)
+
+      # Decompressed bytes
+      self.assertEqual(metrics.count, len(self.content))
+
+  def testConversion(self):
+    x2c = Xml2Cypher.parse(helpers.CONST_Example_Schema)
+    expected = helpers.convert(
+      x2c, helpers.CONST_Example_Document, helpers.CONST_Example_Functions
+    )
+
+    for (extension, (_, compress)) in CONST_Codecs.items():
+      filename = self.copy(extension, compress)
+
+      for applyOptions in [ { 'project': False }, { 'chunkSize': 16 } ]:
+        self.assertEqual(
+          helpers.convert(x2c, filename, helpers.CONST_Example_Functions, applyOptions),
+          expected
+        )
+
+  def testEmpty(self):
+    with InputHelper.InputFile(self.write('empty.xml', '')) as fd:
+      self.assertEqual(fd.map, None)
+      self.assertEqual(fd.read(), b'')
+
+if __name__ == '__main__':
+  unittest.main()
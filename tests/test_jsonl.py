@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+
+# Test framework
+import io
+import json
+import unittest
+
+# X2C
+import JsonLinesWriter
+import Xml2Cypher
+
+# Tests
+import helpers
+
+
+#
+#
+# Tests
+
+class JsonLinesWriterTest(unittest.TestCase):
+
+  def testExample(self):
+    x2c = Xml2Cypher.parse(helpers.CONST_Example_Schema)
+    writer = JsonLinesWriter.JsonLinesWriter(io.StringIO())
+
+    x2c.applyFile(
+      helpers.CONST_Example_Document, writer, writer,
+      helpers.CONST_Example_Functions
+    )
+    writer.close()
+
+    lines = [ json.loads(l) for l in writer.file.getvalue().splitlines() ]
+    ids = set([ l['id'] for l in lines if l['type'] == 'node' ])
+    relationships = [ l for l in lines if l['type'] == 'relationship' ]
+
+    self.assertEqual(len(relationships), 9)
+
+    for l in relationships:
+      self.assertIn(l['start']['id'], ids)
+      self.assertIn(l['end']['id'], ids)
+
+  def testSharedEndpoint(self):
+    writer = JsonLinesWriter.JsonLinesWriter(io.StringIO())
+    writer.node('Artist', { 'name': 'Archive', 'id': 1 })
+    writer.node('Artist', { 'name': 'Archive', 'id': 2 })
+    writer.node('Artist', { 'name': 'Pink Floyd', 'id': 3 })
+    writer.node('Song', { 'title': 'Again' })
+    writer.relationship('Artist', { 'name': 'Archive' }, 'Song', { 'title': 'Again' }, 'AUTHORED')
+    writer.close()
+
+    lines = [ json.loads(l) for l in writer.file.getvalue().splitlines() ]
+    relationships = [ l for l in lines if l['type'] == 'relationship' ]
+
+    # Both nodes a MATCH on the name would find
+    self.assertEqual([ l['start']['id'] for l in relationships ], [ '0', '1' ])
+    self.assertEqual(set([ l['end']['id'] for l in relationships ]), { '3' })
+    self.assertEqual([ l['id'] for l in relationships ], [ '0', '1' ])
+
+  def testUnresolved(self):
+    writer = JsonLinesWriter.JsonLinesWriter(io.StringIO())
+    writer.node('Song', { 'id': 1 })
+    writer.relationship('Artist', { 'id': 2 }, 'Song', { 'id': 1 }, 'AUTHORED')
+
+    with self.assertRaises(ValueError):
+      writer.close()
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+
+# Test framework
+import io
+import os
+import unittest
+
+# X2C
+import CypherWriter
+import Metrics
+import Xml2Cypher
+
+# Tests
+import helpers
+
+
+#
+#
+# Tests
+
+class MetricsTest(unittest.TestCase):
+
+  def testParseSnapshots(self):
+    x2c = Xml2Cypher.parse(helpers.CONST_Example_Schema)
+    filename = helpers.CONST_Example_Document
+    snapshots = []
+    metrics = Metrics.Metrics(snapshots.append, interval = 0)
+
+    x2c.applyFile(
+      filename, CypherWriter.CypherWriter(io.StringIO()),
+      CypherWriter.CypherWriter(io.StringIO()), helpers.CONST_Example_Functions,
+      metrics = metrics, chunkSize = 64
+    )
+    final = metrics.close()
+
+    # Reported while parsing, before the first record
+    parsing = [ s for s in snapshots if s['records'] == 0 and s['inputBytes'] > 0 ]
+
+    self.assertGreater(len(parsing), 1)
+    self.assertEqual(final['inputBytes'], os.path.getsize(filename))
+
+if __name__ == '__main__':
+  unittest.main()
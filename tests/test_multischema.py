@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+
+# Test framework
+import io
+import unittest
+
+# X2C
+import CypherWriter
+import IdHelper
+import Xml2Cypher
+
+# Tests
+import helpers
+
+
+#
+#
+# Constants
+
+# Reads other parts of the example document, with other labels
+CONST_Title_Schema = """structures:
+  :songs()
+    Title:song(id:->id, text:title->string, tags:@tags->string)[]
+schema:
+  :songs()->songs()
+"""
+
+
+#
+#
+# Tests
+
+class MultiSchemaTest(helpers.TempDirTestCase):
+
+  def testSeparateOutputs(self):
+    schemas = [
+      Xml2Cypher.parse(helpers.CONST_Example_Schema), self.parse(CONST_Title_Schema)
+    ]
+    functions = [ helpers.CONST_Example_Functions, None ]
+
+    expected = [
+      helpers.convert(x2c, helpers.CONST_Example_Document, f)
+      for (x2c, f) in zip(schemas, functions)
+    ]
+
+    writers = [
+      ( CypherWriter.CypherWriter(io.StringIO()), CypherWriter.CypherWriter(io.StringIO()) )
+      for _ in schemas
+    ]
+
+    IdHelper.IdHelper.idDict.clear()
+    Xml2Cypher.X2CMultiSchema(schemas).applyFile(
+      helpers.CONST_Example_Document, writers, functions
+    )
+
+    for (nodeWriter, rsWriter) in writers:
+      nodeWriter.close()
+      rsWriter.close()
+
+    self.assertEqual(
+      [ ( n.file.getvalue(), r.file.getvalue() ) for (n, r) in writers ], expected
+    )
+    self.assertEqual(expected[1][0].count('CREATE (:Title'), 3)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+
+# Test framework
+import unittest
+
+# X2C
+import Xml2Cypher
+
+# Tests
+import helpers
+
+
+#
+#
+# Constants
+CONST_Document = """<catalog>
+  <entry rank="x"><title>Again</title><year>2002</year></entry>
+  <entry rank="x"><title>Noise</title></entry>
+  <entry rank="3"><year>2004</year><title>Lights</title></entry>
+</catalog>
+"""
+
+# Guard hoisted past the generated id, the literal and the optional paths
+CONST_Hoisted_Schema = """structures:
+  :catalog()
+    Album:entry(id:->id, source:"feed"->string, ?name:title->string, ?rank:@rank->int, !year:year->int, title:title->string)[]
+schema:
+  :catalog()->catalog()
+"""
+
+# Guard declared after a mandatory property
+CONST_Mandatory_Schema = """structures:
+  :catalog()
+    Album:entry(id:->id, title:title->string, !year:year->int)[]
+schema:
+  :catalog()->catalog()
+"""
+
+
+#
+#
+# Tests
+
+class OptimizerTest(helpers.TempDirTestCase):
+
+  def testExample(self):
+    schema = helpers.CONST_Example_Schema
+    filename = helpers.CONST_Example_Document
+    userFunctions = helpers.CONST_Example_Functions
+
+    expected = helpers.convert(Xml2Cypher.parse(schema), filename, userFunctions)
+    actual = helpers.convert(Xml2Cypher.parse(schema, True), filename, userFunctions)
+
+    self.assertEqual(expected[0].count(';\n'), 12)
+    self.assertEqual(actual, expected)
+
+  def testHoistedGuard(self):
+    schema = self.write('hoisted.schema', CONST_Hoisted_Schema)
+    filename = self.write('catalog.xml', CONST_Document)
+
+    optimized = Xml2Cypher.parse(schema, True)
+    node = optimized.context.types['catalog'][0].children[0]
+
+    self.assertEqual(len(node.guards), 1)
+
+    expected = helpers.convert(Xml2Cypher.parse(schema), filename)
+
+    self.assertEqual(expected[0].count('CREATE (:Album'), 2)
+    self.assertEqual(helpers.convert(optimized, filename), expected)
+
+  def testMandatoryBeforeGuard(self):
+    schema = self.write('mandatory.schema', CONST_Mandatory_Schema)
+    filename = self.write('catalog.xml', CONST_Document.replace('<title>Noise</title>', ''))
+
+    optimized = Xml2Cypher.parse(schema, True)
+    node = optimized.context.types['catalog'][0].children[0]
+
+    self.assertEqual(node.guards, [])
+
+    for x2c in ( Xml2Cypher.parse(schema), optimized ):
+      with self.assertRaises(ValueError):
+        helpers.convert(x2c, filename)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+
+# Test framework
+import json
+import os
+import re
+import unittest
+
+# X2C
+import PartitionedWriter
+
+# Tests
+import helpers
+
+
+#
+#
+# Constants
+
+# Endpoint variables of a relationship statement, named after their label and
+# properties
+RE_Endpoint = re.compile(r'^MATCH \((\w+):(\w+)\{', re.M)
+
+
+#
+#
+# Tests
+
+class PartitionedWriterTest(helpers.TempDirTestCase):
+
+  #
+  # Write {relationships} ( src label, src props, tgt label, tgt props ),
+  # return the manifest
+  def convert(self, relationships, partitions = 3):
+    filename = os.path.join(self.dir, 'relationships.cql')
+    writer = PartitionedWriter.PartitionedWriter(filename, partitions)
+
+    for (l1, p1, l2, p2) in relationships:
+      writer.relationship(l1, p1, l2, p2, 'LIKES')
+
+    writer.close()
+
+    with open(writer.manifest, encoding="utf8") as fd:
+      return json.load(fd)
+
+  #
+  # [ ( endpoint variable, label ) ] of each relationship of {name}
+  def endpoints(self, name):
+    with open(os.path.join(self.dir, name), encoding="utf8") as fd:
+      content = fd.read()
+
+    statements = [ s for s in content.split(";\n") if s.strip() ]
+
+    return [ RE_Endpoint.findall(s) for s in statements ]
+
+  def testPhases(self):
+    relationships = [
+      ( 'Person', { 'id': i % 37 }, 'Song', { 'id': (i * 7) % 53 } ) for i in range(300)
+    ]
+    manifest = self.convert(relationships)
+    phases = manifest['phases']
+
+    self.assertEqual(manifest['version'], PartitionedWriter.CONST_Manifest_Version)
+    self.assertGreater(len(phases), 1)
+    self.assertEqual([ p['serial'] for p in phases ], [ False ] * (len(phases) - 1) + [ True ])
+    self.assertEqual(phases[-1]['files'], [ 'relationships.cql' ])
+
+    total = 0
+
+    for phase in phases:
+      owners = {}
+
+      for (name, count) in zip(phase['files'], phase['relationships']):
+        statements = self.endpoints(name)
+        self.assertEqual(len(statements), count)
+        total += count
+
+        # No endpoint is locked by two files of a phase
+        for endpoints in statements:
+          self.assertEqual(len(endpoints), 2)
+
+          for (var, _) in endpoints:
+            self.assertEqual(owners.setdefault(var, name), name)
+
+    self.assertEqual(total, len(relationships))
+
+  def testAmbiguousLabel(self):
+    relationships = [
+      ( 'Album', { 'id': i % 5 }, 'Song', { 'id': i } ) for i in range(40)
+    ] + [
+      ( 'Person', { 'id': 1 }, 'Song', { 'id': 1 } ),
+      ( 'Person', { 'name': 'Craig' }, 'Song', { 'id': 2 } )
+    ]
+    phases = self.convert(relationships)['phases']
+
+    self.assertGreater(len(phases), 1)
+
+    for phase in phases[:-1]:
+      for name in phase['files']:
+        for endpoints in self.endpoints(name):
+          self.assertNotIn('Person', [ label for (_, label) in endpoints ])
+
+    serial = self.endpoints(phases[-1]['files'][0])
+
+    self.assertEqual(len([ e for e in serial if e[0][1] == 'Person' ]), 2)
+
+if __name__ == '__main__':
+  unittest.main()
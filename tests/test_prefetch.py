@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+
+# Test framework
+import unittest
+
+# X2C
+import IdHelper
+import StatementWriter
+import Xml2Cypher
+
+# Tests
+import helpers
+
+
+#
+#
+# Tests
+
+class PrefetchTest(unittest.TestCase):
+
+  #
+  # Calls to the batch version of the example's parseTags and nodes written,
+  # in order, with {size}
+  def convert(self, size):
+    x2c = Xml2Cypher.parse(helpers.CONST_Example_Schema)
+    log = []
+
+    def parseAllTags(paramsList):
+      log.append(( 'call', len(paramsList) ))
+      return [ params['tags'].split(' ') for params in paramsList ]
+
+    def write(item):
+      if item[0] == 'node':
+        log.append(( item[1], item[2].get('title', item[2].get('name')) ))
+
+    writer = StatementWriter.RecordWriter(write)
+
+    IdHelper.IdHelper.idDict.clear()
+    x2c.applyFile(
+      helpers.CONST_Example_Document, writer, writer,
+      { 'parseTags': Xml2Cypher.batch(parseAllTags, size = size) }
+    )
+
+    return log
+
+  def testChunks(self):
+    log = self.convert(2)
+    calls = [ i for (i, item) in enumerate(log) if item[0] == 'call' ]
+    songs = [ i for (i, item) in enumerate(log) if item[0] == 'Song' ]
+
+    self.assertEqual([ log[i][1] for i in calls ], [ 2, 1 ])
+    # The second chunk is called once the first one is written
+    self.assertTrue(calls[0] < songs[0] < songs[1] < calls[1] < songs[2])
+
+    unbounded = self.convert(None)
+
+    self.assertEqual([ item for item in unbounded if item[0] == 'call' ], [ ( 'call', 3 ) ])
+    self.assertEqual(
+      [ item for item in log if item[0] != 'call' ],
+      [ item for item in unbounded if item[0] != 'call' ]
+    )
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+
+# Test framework
+import unittest
+
+# Tests
+import helpers
+
+
+#
+#
+# Constants
+
+# Items nested at any depth
+CONST_Recursive_Schema = """structures:
+  Item:item(id:->id, name:@name->string, title:title->string)[]
+    ?:item()[]->item()
+schema:
+  :root()
+    :item()[]->item()
+"""
+
+CONST_Recursive_Document = """<root>
+  <item name="a">
+    <title>x</title>
+    <note>skipped</note>
+    <item name="b"><title>y</title><item name="c"><title>z</title></item></item>
+  </item>
+  <item name="d"><title>w</title></item>
+  <other>skipped</other>
+</root>
+"""
+
+
+#
+#
+# Tests
+
+class ProjectionTest(helpers.TempDirTestCase):
+
+  def testRecursiveStructure(self):
+    x2c = self.parse(CONST_Recursive_Schema)
+    filename = self.write('root.xml', CONST_Recursive_Document)
+
+    projected = helpers.convert(x2c, filename)
+    whole = helpers.convert(x2c, filename, applyOptions = { 'project': False })
+
+    self.assertEqual(projected, whole)
+    self.assertEqual(projected[0].count('CREATE (:Item'), 4)
+
+    # Items are kept whole, the rest is still skipped
+    root = x2c.projection().children['root']
+
+    self.assertFalse(root.keepAll)
+    self.assertEqual(list(root.children), [ 'item' ])
+    self.assertTrue(root.children['item'].keepAll)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+
+# Test framework
+import io
+import re
+import unittest
+
+# X2C
+import CypherWriter
+import DedupHelper
+
+
+#
+#
+# Constants
+
+# ( artist, song ) of AUTHORED relationships, with a duplicate
+CONST_Relationships = [
+  ( 'Archive', 'Again' ),
+  ( 'Archive', 'Noise' ),
+  ( 'Pink Floyd', 'Time' ),
+  ( 'Archive', 'Again' )
+]
+
+
+#
+#
+# Tests
+
+class RelationshipsTest(unittest.TestCase):
+
+  #
+  # Writer to memory, with relationships {pairs} pending
+  def writer(self, pairs = CONST_Relationships, **options):
+    writer = CypherWriter.CypherWriter(io.StringIO(), **options)
+
+    for (artist, song) in pairs:
+      writer.relationship('Artist', { 'name': artist }, 'Song', { 'title': song }, 'AUTHORED')
+
+    return writer
+
+  #
+  # Statements written by {writer} once closed
+  def statements(self, writer):
+    writer.close()
+
+    # Each statement ends with ";\n"
+    return writer.file.getvalue().split(';\n')[:-1]
+
+  def testInterned(self):
+    writer = self.writer()
+
+    self.assertEqual(writer.pendingCount, 4)
+    self.assertEqual(
+      writer.endpointProps,
+      [ '{name: "Archive"}', '{title: "Again"}', '{title: "Noise"}',
+        '{name: "Pink Floyd"}', '{title: "Time"}' ]
+    )
+    self.assertEqual(list(writer.rsSrc), [ 0, 0, 3, 0 ])
+    self.assertEqual(list(writer.rsTgt), [ 1, 2, 4, 1 ])
+    self.assertEqual(writer.stringList, [ 'AUTHORED', '' ])
+    self.assertEqual(list(writer.rsType), [ 0 ] * 4)
+
+    archive = 'MATCH (Artist%s:Artist{name: "Archive"})\n' %                   \
+      writer.hashProperties({ 'name': 'Archive' })
+    statements = self.statements(writer)
+
+    self.assertEqual(len(statements), 4)
+    self.assertEqual(writer.pendingCount, 0)
+    self.assertEqual(len([ s for s in statements if s.startswith(archive) ]), 3)
+
+  def testImport(self):
+    expected = self.statements(self.writer())
+
+    # Handles of the importing writer differ from the exported ones
+    pairs = [ ( 'Pink Floyd', 'Time' ) ]
+    writer = self.writer(pairs)
+    writer.importRelationships(self.writer().exportRelationships())
+
+    self.assertEqual(writer.pendingCount, 5)
+    self.assertEqual(len(writer.endpointProps), 5)
+    self.assertEqual(
+      sorted(self.statements(writer)), sorted(expected + self.statements(self.writer(pairs)))
+    )
+
+  def testDedup(self):
+    expected = sorted(self.statements(self.writer(CONST_Relationships[:3])))
+
+    for dedup in [ 'exact', 'bloom' ]:
+      writer = self.writer(dedup = dedup)
+
+      self.assertEqual(( writer.pendingCount, writer.duplicates ), ( 3, 1 ))
+      self.assertEqual(sorted(self.statements(writer)), expected)
+
+    # Duplicates across imported relationships
+    writer = self.writer(dedup = 'exact')
+    writer.importRelationships(self.writer().exportRelationships())
+
+    self.assertEqual(( writer.pendingCount, writer.duplicates ), ( 3, 5 ))
+
+    with self.assertRaises(ValueError):
+      self.writer(dedup = 'fuzzy')
+
+  def testBloomCounts(self):
+    # Pairs of 50 artists and 50 songs, each one 1 to 3 times
+    pairs = [
+      ( 'Artist %d' % (i % 50), 'Song %d' % (i // 50) )
+      for i in range(2500) for _ in range(1 + i % 3)
+    ]
+
+    exact = self.writer(pairs, dedup = 'exact')
+    bloom = self.writer(pairs, dedup = DedupHelper.BloomFilter(100000))
+
+    self.assertEqual(exact.pendingCount, 2500)
+    self.assertEqual(
+      ( bloom.pendingCount, bloom.duplicates ), ( exact.pendingCount, exact.duplicates )
+    )
+
+    # Overfull: false positives drop new relationships, duplicates are
+    # always dropped
+    small = self.writer(pairs, dedup = DedupHelper.BloomFilter(100))
+
+    self.assertLess(small.pendingCount, exact.pendingCount)
+    self.assertEqual(small.pendingCount + small.duplicates, len(pairs))
+    self.assertEqual(len(set(zip(small.rsSrc, small.rsTgt))), small.pendingCount)
+
+  def testOrders(self):
+    pairs = [
+      ( 'Archive', 'Again' ), ( 'Pink Floyd', 'Time' ),
+      ( 'Archive', 'Noise' ), ( 'Pink Floyd', 'Again' )
+    ]
+    expected = {
+      'source': [
+        ( 'Archive', 'Again' ), ( 'Archive', 'Noise' ),
+        ( 'Pink Floyd', 'Again' ), ( 'Pink Floyd', 'Time' )
+      ],
+      'target': [
+        ( 'Archive', 'Again' ), ( 'Pink Floyd', 'Again' ),
+        ( 'Pink Floyd', 'Time' ), ( 'Archive', 'Noise' )
+      ]
+    }
+    statements = sorted(self.statements(self.writer(pairs)))
+
+    for (order, ordered) in expected.items():
+      actual = self.statements(self.writer(pairs, order = order))
+
+      # Same statements, clustered by endpoint in first reference order
+      self.assertEqual(sorted(actual), statements)
+      self.assertEqual([
+        re.search(r'name: "([^"]*)".*title: "([^"]*)"', s, re.DOTALL).groups()
+        for s in actual
+      ], ordered)
+
+    with self.assertRaises(ValueError):
+      self.writer(pairs, order = 'random')
+
+if __name__ == '__main__':
+  unittest.main()
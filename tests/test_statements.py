@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+
+# Test framework
+import threading
+import unittest
+
+# X2C
+import IdHelper
+import Xml2Cypher
+
+# Tests
+import helpers
+
+
+#
+#
+# Tests
+
+class StatementsTest(unittest.TestCase):
+
+  def setUp(self):
+    self.x2c = Xml2Cypher.parse(helpers.CONST_Example_Schema)
+
+  #
+  # Items of `iterStatements` on the example document, sequential ids reset
+  def iterate(self, **options):
+    IdHelper.IdHelper.idDict.clear()
+
+    return self.x2c.iterStatements(
+      helpers.CONST_Example_Document, helpers.CONST_Example_Functions, **options
+    )
+
+  def testStatements(self):
+    (nodes, relationships) = helpers.convert(
+      self.x2c, helpers.CONST_Example_Document, helpers.CONST_Example_Functions
+    )
+
+    # Files end statements with ";\n"
+    expected =                                                                \
+      [ ( 'node', s ) for s in nodes.split(';\n')[:-1] ] +                    \
+      [ ( 'relationship', s ) for s in relationships.split(';\n')[:-1] ]
+
+    self.assertEqual(list(self.iterate()), expected)
+
+    # Compact statements from a parsed document
+    (nodes, relationships) = helpers.convert(
+      self.x2c, helpers.CONST_Example_Document, helpers.CONST_Example_Functions,
+      compact = True
+    )
+
+    self.assertEqual(
+      [ s for (_, s) in self.iterate(compact = True) ],
+      (nodes + relationships).split(';\n')[:-1]
+    )
+
+  def testRecords(self):
+    items = list(self.iterate(records = True))
+    seen = []
+
+    self.assertEqual(len(items), 21)
+
+    # Relationships right after their nodes
+    for item in items:
+      if item[0] == 'node':
+        seen.append(item[1:3])
+        continue
+
+      for (label, properties) in [ item[1:3], item[3:5] ]:
+        self.assertTrue(any([
+          l == label and all([ p.get(k, None) == v for (k, v) in properties.items() ])
+          for (l, p) in seen
+        ]))
+
+  def testErrors(self):
+    IdHelper.IdHelper.idDict.clear()
+
+    with self.assertRaises(ValueError):
+      list(self.x2c.iterStatements(helpers.CONST_Example_Document, {}))
+
+  def testClose(self):
+    threads = threading.active_count()
+    items = self.iterate(queueSize = 1)
+
+    self.assertEqual(next(items)[0], 'node')
+
+    # The producer is stopped
+    items.close()
+    self.assertEqual(threading.active_count(), threads)
+
+    self.assertEqual(len(list(self.iterate())), 21)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+
+# Test framework
+import json
+import os
+import unittest
+
+# X2C
+import IdHelper
+import X2CCommand
+import Xml2Cypher
+
+# Tests
+import helpers
+
+
+#
+#
+# Constants
+CONST_Document = """<catalog>
+  <entry><title>Again</title><year>2002</year></entry>
+  <entry rank="2"><title>Noise</title></entry>
+  <entry><title>Lights</title><year>2004</year></entry>
+</catalog>
+"""
+
+CONST_Schema = """structures:
+  :catalog()
+    Album:entry(id:->id, title:title->string, ?rank:@rank->int, !year:year->int)[]
+schema:
+  :catalog()->catalog()
+"""
+
+
+#
+#
+# Tests
+
+class StatsTest(helpers.TempDirTestCase):
+
+  def testCounts(self):
+    x2c = Xml2Cypher.parse(helpers.CONST_Example_Schema)
+    filename = helpers.CONST_Example_Document
+    userFunctions = helpers.CONST_Example_Functions
+
+    report = x2c.dryRunFile(filename, userFunctions)
+    (nodes, relationships) = helpers.convert(x2c, filename, userFunctions)
+
+    self.assertEqual(report['nodes'], { 'Song': 3, 'Artist': 3, 'Tag': 6 })
+    self.assertEqual(report['relationships'], { 'AUTHORED': 3, 'HAS_TAG': 6 })
+    self.assertEqual(report['nodesTotal'], nodes.count(';\n'))
+    self.assertEqual(report['relationshipsTotal'], relationships.count(';\n'))
+
+    # Ids, titles and tag names
+    self.assertEqual(report['properties'], 24)
+    self.assertEqual(sum(report['propertySizes'].values()), 24)
+
+  def testMisses(self):
+    x2c = self.parse(CONST_Schema)
+    report = x2c.dryRunFile(self.write('catalog.xml', CONST_Document))
+
+    self.assertEqual(report['nodes'], { 'Album': 2 })
+    self.assertEqual(report['optionalMisses'], { 'Album.rank': 2 })
+    self.assertEqual(report['conditionalMisses'], { 'Album.year': 1 })
+
+  def testCommand(self):
+    output = os.path.join(self.dir, 'out')
+    argv = [
+      helpers.CONST_Example_Schema, helpers.CONST_Example_Document, '-o', output,
+      '-f', 'helpers', '--writer', 'stats'
+    ]
+
+    IdHelper.IdHelper.idDict.clear()
+    self.assertEqual(X2CCommand.main(argv), 0)
+    self.assertEqual(os.listdir(output), [ X2CCommand.CONST_Stats_Filename ])
+
+    with open(os.path.join(output, X2CCommand.CONST_Stats_Filename), encoding="utf8") as fd:
+      report = json.load(fd)
+
+    IdHelper.IdHelper.idDict.clear()
+    expected = Xml2Cypher.parse(helpers.CONST_Example_Schema).dryRunFile(
+      helpers.CONST_Example_Document, helpers.CONST_Example_Functions
+    )
+
+    # JSON keys are strings
+    self.assertEqual(report, json.loads(json.dumps(expected)))
+
+if __name__ == '__main__':
+  unittest.main()